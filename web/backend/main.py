@@ -12,7 +12,7 @@ import aiohttp
 from pathlib import Path
 from dotenv import load_dotenv, find_dotenv
 from services.resume_parser import ResumeParser
-from services.ai_service import AIService
+from services.ai_service import get_ai_service, close_http_client
 from services.storage_service import StorageService
 from services.embedding_service import EmbeddingService
 from services.job_scoring_service import JobScoringService
@@ -111,11 +111,16 @@ for var, default_func in optional_env_vars.items():
 
 # Initialize services
 resume_parser = ResumeParser()
-ai_service = AIService(use_mock=False)
+ai_service = get_ai_service()
 storage_service = StorageService()
 embedding_service = EmbeddingService()
 job_scoring_service = JobScoringService()
 
+@app.on_event("shutdown")
+async def close_services():
+    """Release pooled connections held by long-lived services."""
+    await close_http_client()
+
 # In-memory cache for analysis data
 analysis_cache = {
     'latest': None,  # Latest analysis
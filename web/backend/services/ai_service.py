@@ -1,13 +1,493 @@
 import os
-import requests
+import httpx
 import json
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple, AsyncIterator, Awaitable, Callable
 import logging
 import time
 import re
+import asyncio
+import hashlib
+import functools
+import copy
+from collections import OrderedDict
+import msgspec
+import json5
+import orjson
 
 logger = logging.getLogger(__name__)
 
+# Upper bound on how much of an unparseable agent response is echoed back to callers
+MAX_RAW_CONTENT_CHARS = 2048
+
+class Schedule(msgspec.Struct):
+    """Interview schedule recommendation returned by the agent."""
+    recommendedDuration: str
+    suggestedTimeSlots: List[str]
+    interviewType: str
+
+class InterviewQuestions(msgspec.Struct):
+    """Interview questions grouped by category."""
+    technicalQuestions: List[str] = []
+    behavioralQuestions: List[str] = []
+    culturalFitQuestions: List[str] = []
+
+class InterviewPackage(msgspec.Struct):
+    """Questions and schedule generated together in one agent call."""
+    questions: InterviewQuestions
+    schedule: Schedule
+
+class AgentHTTPError(Exception):
+    """Non-200 response from the agent endpoint."""
+    def __init__(self, message: str, status_code: int, body: str = ""):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+def _rejects_request_option(status_code: int) -> bool:
+    """True for 4xx statuses that can mean an unsupported request field, as opposed to auth or rate limits."""
+    return 400 <= status_code < 500 and status_code not in (401, 403, 408, 429)
+
+def _names_response_format(body: str) -> bool:
+    """True if an error body blames the response_format/json_schema field itself."""
+    body = body.lower()
+    return "response_format" in body or "json_schema" in body
+
+def _response_schema(type: Any) -> Dict[str, Any]:
+    """
+    JSON schema for a msgspec struct with the struct's own object schema at the root
+    (json_schema response formats require "type": "object" there rather than a bare $ref);
+    nested structs stay in $defs.
+    """
+    schema = msgspec.json.schema(type)
+    defs = schema.pop("$defs", {})
+    root = dict(defs.pop(type.__name__))
+    if defs:
+        root["$defs"] = defs
+    return root
+
+# Structured-output request so schema-aware endpoints constrain decoding to an InterviewPackage
+_INTERVIEW_PACKAGE_FORMAT = {
+    "type": "json_schema",
+    "json_schema": {
+        "name": "interview_package",
+        "schema": _response_schema(InterviewPackage)
+    }
+}
+
+# Fenced ```json block anywhere in an agent response
+_JSON_BLOCK_RE = re.compile(r"```(?:json)?\s*([\s\S]*?)```")
+_JSON_DECODER = json.JSONDecoder()
+
+def _preview(s: str, n: int = 100) -> str:
+    """
+    Truncate text for log output, marking when it was cut.
+    """
+    return s if len(s) <= n else s[:n] + "…"
+
+def _strip_fence(content: str) -> str:
+    """
+    Extract the JSON payload from an agent response that is wrapped in a markdown
+    code fence or surrounded by prose.
+    """
+    match = _JSON_BLOCK_RE.search(content)
+    if match:
+        return match.group(1).strip()
+    
+    # Un-fenced JSON inside text: let the C decoder find where the object ends,
+    # which also copes with braces inside string values
+    start = content.find("{")
+    if start < 0:
+        return content
+    try:
+        # raw_decode scans from the offset in place and returns an absolute end index
+        _, end = _JSON_DECODER.raw_decode(content, start)
+    except json.JSONDecodeError:
+        return content
+    return content[start:end]
+
+def _parse_llm_json(content: str, type: Any = Any) -> Any:
+    """
+    Parse JSON from an agent response into the given type.
+    Strips a markdown fence, tries strict JSON first and falls back to JSON5 for the
+    usual LLM slips (single quotes, trailing commas, unquoted keys).
+    Raises ValueError if the content can't be parsed or doesn't match the type.
+    """
+    # Only responses that don't already start as JSON can be fenced
+    if content[:1] not in ("{", "["):
+        content = _strip_fence(content)
+    try:
+        return msgspec.json.decode(content, type=type)
+    except msgspec.ValidationError:
+        # Well-formed JSON with the wrong shape won't improve with a laxer parser
+        raise
+    except msgspec.DecodeError:
+        pass
+    return msgspec.convert(json5.loads(content), type=type)
+
+def _slim_analysis(structured_data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Reduce a resume analysis to the fields interview generation needs: top skills,
+    experience level, recent roles and degrees. Falls back to the full data if none are present.
+    """
+    skills: List[str] = []
+    for key in ("programming_languages", "technical_skills", "skills"):
+        for skill in structured_data.get(key) or ():
+            if isinstance(skill, str) and skill not in skills:
+                skills.append(skill)
+    
+    slim: Dict[str, Any] = {}
+    if skills:
+        slim["skills"] = skills[:10]
+    if structured_data.get("experience_level"):
+        slim["experience_level"] = structured_data["experience_level"]
+    experience = [
+        {"title": exp.get("title", ""), "company": exp.get("company", "")}
+        for exp in (structured_data.get("experience") or [])[:3] if isinstance(exp, dict)
+    ]
+    if experience:
+        slim["experience"] = experience
+    education = []
+    for edu in structured_data.get("education") or ():
+        if isinstance(edu, dict) and edu.get("degree"):
+            entry = {"degree": edu["degree"]}
+            if edu.get("field"):
+                entry["field"] = edu["field"]
+            education.append(entry)
+    if education:
+        slim["education"] = education
+    
+    return slim or structured_data
+
+class _JSONMemberStream:
+    """
+    Incremental scanner for a JSON object that arrives in text chunks.
+    feed() returns (path, value) for every value completed by the new text, with paths
+    like ("questions", "technicalQuestions", 0); only values up to max_depth are decoded.
+    Text before the root "{" (such as a markdown fence) and after it closes is ignored.
+    A closed candidate root that isn't a JSON object with one of root_keys (for example
+    braces in prose before a fenced block) is discarded and scanning continues.
+    """
+    def __init__(self, max_depth: int = 3, root_keys: Tuple[str, ...] = ()):
+        self.max_depth = max_depth
+        self.root_keys = root_keys
+        self.done = False
+        self._buf = ""
+        self._pos = 0
+        self._stack: List[Dict[str, Any]] = []
+        self._in_string = False
+        self._escape = False
+        self._string_start = 0
+
+    def feed(self, text: str) -> List[Tuple[Tuple[Any, ...], Any]]:
+        self._buf += text
+        buf = self._buf
+        events: List[Tuple[Tuple[Any, ...], Any]] = []
+        stack = self._stack
+        for i in range(self._pos, len(buf)):
+            if self.done:
+                break
+            ch = buf[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    self._end_string(i, events)
+                continue
+            if not stack:
+                if ch == "{":
+                    stack.append(self._frame("{", i))
+                continue
+            frame = stack[-1]
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch == "{" or ch == "[":
+                stack.append(self._frame(ch, i))
+            elif ch == "}" or ch == "]":
+                self._end_scalar(frame, i, events)
+                stack.pop()
+                if stack:
+                    self._emit(frame["start"], i + 1, events)
+                elif self._accept_root(frame["start"], i + 1, events):
+                    self.done = True
+            elif ch == ",":
+                self._end_scalar(frame, i, events)
+                if frame["kind"] == "[":
+                    frame["key"] += 1
+                else:
+                    frame["expect_key"] = True
+            elif ch == ":" or ch.isspace():
+                continue
+            elif frame["scalar_start"] is None:
+                # Start of a number, true, false or null
+                frame["scalar_start"] = i
+        self._pos = len(buf)
+        return events
+
+    @staticmethod
+    def _frame(kind: str, start: int) -> Dict[str, Any]:
+        return {"kind": kind, "start": start, "key": 0 if kind == "[" else None, "expect_key": kind == "{", "scalar_start": None}
+
+    def _end_string(self, end: int, events: List[Tuple[Tuple[Any, ...], Any]]) -> None:
+        frame = self._stack[-1]
+        if frame["kind"] == "{" and frame["expect_key"]:
+            frame["key"] = json.loads(self._buf[self._string_start:end + 1])
+            frame["expect_key"] = False
+        else:
+            self._emit(self._string_start, end + 1, events)
+
+    def _end_scalar(self, frame: Dict[str, Any], end: int, events: List[Tuple[Tuple[Any, ...], Any]]) -> None:
+        if frame["scalar_start"] is not None:
+            self._emit(frame["scalar_start"], end, events)
+            frame["scalar_start"] = None
+
+    def _accept_root(self, start: int, end: int, events: List[Tuple[Tuple[Any, ...], Any]]) -> bool:
+        try:
+            value = json.loads(self._buf[start:end])
+        except ValueError:
+            return False
+        if not isinstance(value, dict) or (self.root_keys and not any(key in value for key in self.root_keys)):
+            return False
+        events.append(((), value))
+        return True
+
+    def _emit(self, start: int, end: int, events: List[Tuple[Tuple[Any, ...], Any]]) -> None:
+        # The completed value sits at the current key/index of each open container
+        if len(self._stack) > self.max_depth:
+            return
+        try:
+            value = json.loads(self._buf[start:end])
+        except ValueError:
+            return
+        events.append((tuple(frame["key"] for frame in self._stack), value))
+
+def _package_events(package: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """
+    The stream_interview_package events for an already complete package.
+    """
+    questions = package.get("questions", {})
+    events = [
+        {"type": "question", "category": category, "question": question}
+        for category, category_questions in questions.items()
+        for question in category_questions
+    ]
+    events.append({"type": "questions", "questions": questions})
+    events.append({"type": "schedule", "schedule": package.get("schedule", {})})
+    events.append({"type": "package", "package": package})
+    return events
+
+# Technical skill categories surfaced to the agent, in display order
+_SKILL_CATEGORIES = ("programming_languages", "frameworks", "cloud_and_devops", "tools")
+
+def format_candidate_data(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Format candidate data into a clean, structured format that's easy for the agent to use.
+    Pure function of its input, so callers can format a candidate once and reuse the result.
+    """
+    try:
+        # Check if data is the right structure
+        if not data or not isinstance(data, dict):
+            logger.warning(f"Invalid data format: {type(data)}")
+            return {"error": "Invalid data format"}
+        
+        # Convert Pydantic model to dict if needed
+        if hasattr(data, 'dict'):
+            data = data.dict()
+        
+        # Format the data in a simplified structure
+        formatted_data = {}
+        
+        # Extract data from analysis
+        if "analysis" in data:
+            analysis = data["analysis"]
+            formatted_data["overall_score"] = analysis.get("overall_fit_score", 0)
+            formatted_data["experience_level"] = analysis.get("experience_level", "Unknown")
+            formatted_data["education_score"] = analysis.get("education", 0)
+            formatted_data["cultural_fit"] = analysis.get("cultural_fit", 0)
+            
+            # Process technical skills
+            if "technical_skills" in analysis:
+                tech_skills = analysis["technical_skills"]
+                formatted_data["skills"] = []
+                
+                # Process each skill category
+                for category in _SKILL_CATEGORIES:
+                    if category in tech_skills and isinstance(tech_skills[category], dict):
+                        for skill, score in tech_skills[category].items():
+                            formatted_data["skills"].append({
+                                "name": skill,
+                                "type": category,
+                                "score": score
+                            })
+        
+        # Process structured data
+        if "structured_data" in data:
+            structured = data["structured_data"]
+            
+            # Process education
+            if "education" in structured:
+                formatted_data["education"] = []
+                for edu in structured["education"]:
+                    if isinstance(edu, dict):
+                        formatted_data["education"].append({
+                            "degree": edu.get("degree", "Unknown"),
+                            "institution": edu.get("school", edu.get("institution", "Unknown")),
+                            "year": edu.get("year", "Unknown")
+                        })
+            
+            # Process experience
+            if "experience" in structured:
+                formatted_data["experience"] = []
+                for exp in structured["experience"]:
+                    if isinstance(exp, dict):
+                        formatted_data["experience"].append({
+                            "title": exp.get("title", "Unknown"),
+                            "company": exp.get("company", "Unknown"),
+                            "duration": exp.get("duration", "Unknown")
+                        })
+        
+        # Generate a comprehensive summary
+        summary_parts = []
+        
+        # Add overall assessment
+        score = formatted_data.get("overall_score")
+        if score is not None:
+            if score >= 90:
+                assessment = "Outstanding"
+            elif score >= 80:
+                assessment = "Strong"
+            elif score >= 70:
+                assessment = "Good"
+            else:
+                assessment = "Fair"
+            summary_parts.append(f"{assessment} candidate with overall score of {score}/100")
+        
+        # Add experience level
+        experience_level = formatted_data.get("experience_level")
+        if experience_level is not None:
+            summary_parts.append(f"Experience Level: {experience_level}")
+        
+        # Add top skills, stopping as soon as three are found
+        top_skills = []
+        for skill in formatted_data.get("skills", ()):
+            if skill["score"] >= 8:
+                top_skills.append(skill["name"])
+                if len(top_skills) == 3:
+                    break
+        if top_skills:
+            summary_parts.append(f"Top Skills: {', '.join(top_skills)}")
+        
+        # Add latest education
+        education = formatted_data.get("education")
+        if education:
+            latest_edu = education[0]
+            summary_parts.append(f"Education: {latest_edu['degree']} from {latest_edu['institution']}")
+        
+        # Add latest experience
+        experience = formatted_data.get("experience")
+        if experience:
+            latest_exp = experience[0]
+            summary_parts.append(f"Latest Role: {latest_exp['title']} at {latest_exp['company']}")
+        
+        # Add cultural fit if high
+        cultural_fit = formatted_data.get("cultural_fit")
+        if cultural_fit is not None and cultural_fit >= 80:
+            summary_parts.append("Strong cultural fit")
+        
+        # Combine all parts into a final summary
+        formatted_data["summary"] = " | ".join(summary_parts)
+        
+        return formatted_data
+        
+    except Exception as e:
+        logger.error(f"Error formatting candidate data: {str(e)}", exc_info=True)
+        return {
+            "error": "Error formatting data",
+            "summary": "Error occurred while processing candidate data"
+        }
+
+def _format_and_serialize(data: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+    """
+    Format candidate data and encode it compactly (the agent doesn't need pretty-printing).
+    """
+    formatted_data = format_candidate_data(data)
+    return formatted_data, orjson.dumps(formatted_data).decode()
+
+def _canonical_key(data: Any, namespace: str = "") -> str:
+    """
+    Hash data independently of dict key order, optionally scoped to a namespace.
+    """
+    encoded = orjson.dumps(data, option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS, default=str)
+    return hashlib.blake2b(encoded, digest_size=16, person=namespace.encode()[:16]).hexdigest()
+
+class AsyncTTLCache:
+    """
+    Bounded cache of coroutine results that expire after a fixed TTL.
+    Only touched from the event loop, so it needs no locking.
+    """
+    def __init__(self, ttl: float = 3600.0, maxsize: int = 256):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def get(self, key: str) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Any) -> None:
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+# Process-wide HTTP client for agent calls, created on first use
+_http_client: Optional[httpx.AsyncClient] = None
+
+def _get_http_client() -> httpx.AsyncClient:
+    """
+    Return the shared HTTP/2 client used for all agent requests.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            # With an explicit transport, HTTP/2 and pool limits are configured on the transport
+            transport=httpx.AsyncHTTPTransport(
+                http2=True,
+                retries=2,  # Retry transient connection errors
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20, keepalive_expiry=120.0)
+            ),
+            timeout=httpx.Timeout(connect=5.0, read=60.0, write=10.0, pool=5.0),
+            # Every agent request body is JSON; only Authorization varies per service
+            headers={"Content-Type": "application/json"}
+        )
+    return _http_client
+
+async def close_http_client() -> None:
+    """
+    Close the shared HTTP client. Call once on application shutdown; a later request
+    would open a fresh client.
+    """
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+# Session used when callers don't track conversations separately
+DEFAULT_SESSION = "default"
+
 class AIService:
     def __init__(self, use_mock=False):  # Default to real mode
         # Get agent ID from environment or use fallback
@@ -16,119 +496,139 @@ class AIService:
         self.base_url = os.getenv('DO_AI_AGENT_URL', f"https://{self.agent_id}.agents.do-ai.run")  # Agent URL from env or construct it
         self.api_url = f"{self.base_url}/api/v1/chat/completions"
         self.use_mock = use_mock
+        # Send a json_schema response_format with interview package requests. Turned off
+        # once the endpoint rejects the field by name; DO_AI_RESPONSE_FORMAT=false disables it upfront.
+        self.use_response_format = os.getenv('DO_AI_RESPONSE_FORMAT', 'true').lower() != 'false'
         
         # Add token caching
         self.token_last_refreshed = 0
         self.token_refresh_interval = 600  # 10 minutes in seconds
         self.auth_token = None  # Will be set on first request
+        self.token_stale_fraction = 0.9  # Refresh in the background after 90% of the interval
+        self.last_refresh_succeeded = False
+        self._refresh_task: Optional[asyncio.Task] = None
+        self._refresh_lock: Optional[asyncio.Lock] = None  # Created lazily inside the running loop
+        self._headers: Optional[Dict[str, str]] = None  # Rebuilt on every token refresh
+        self._masked_token = "None"
+        
+        # Conversation contexts keyed by session id, each bounded to a sliding window.
+        # Least recently used sessions are evicted once max_sessions is reached.
+        self.contexts: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self.max_sessions = 256
+        self.max_messages = 40  # Excluding the system message
+        self.max_total_chars = 60_000
+        # Last serialized candidate data sent in each session, re-sent when a turn omits it
+        self._session_candidates: Dict[str, str] = {}
+        
+        # Formatted candidate data and its JSON encoding, keyed by a hash of the raw data
+        self._candidate_cache: Dict[str, Tuple[Dict[str, Any], str]] = {}
+        self.max_cached_candidates = 32
         
-        # Store the current conversation context
-        self.conversation_context = []
+        # Successful agent responses keyed by a canonical hash of their input
+        self._response_cache = AsyncTTLCache(ttl=3600.0, maxsize=256)
+        
+        # Agent requests currently running, keyed by a hash of their input
+        self._inflight: Dict[str, asyncio.Task] = {}
         
         logger.info(f"AIService initialized with agent ID: {self.agent_id}")
         logger.info(f"API URL: {self.api_url}")
         logger.info(f"Use mock: {self.use_mock}")
 
+    @property
+    def conversation_context(self) -> List[Dict[str, Any]]:
+        """
+        Conversation context of the default session.
+        """
+        return self.contexts.get(DEFAULT_SESSION, [])
+    
+    @conversation_context.setter
+    def conversation_context(self, messages: List[Dict[str, Any]]) -> None:
+        self.contexts[DEFAULT_SESSION] = messages
+    
+    @property
+    def _client(self) -> httpx.AsyncClient:
+        """
+        Pooled client shared by every AIService so keep-alive connections are reused.
+        Looked up per request so no instance keeps a client that was closed at shutdown.
+        """
+        return _get_http_client()
+    
     async def get_auth_token(self) -> str:
         """
         Get an authentication token for the AI agent with caching.
+
+        The cached token is fresh for the first 90% of the refresh interval and stale
+        for the rest; a stale token is returned immediately while a background task
+        refreshes it. Callers only wait on a refresh once the token has expired or the
+        previous refresh failed.
         """
-        current_time = time.time()
+        age = time.time() - self.token_last_refreshed
         
-        # Return cached token if it's still valid
-        if self.auth_token and (current_time - self.token_last_refreshed) < self.token_refresh_interval:
-            logger.info("Using cached auth token")
+        if self.auth_token and self.last_refresh_succeeded and age < self.token_refresh_interval:
+            if age >= self.token_stale_fraction * self.token_refresh_interval:
+                # Stale: serve the cached token and refresh off the critical path
+                if self._refresh_task is None or self._refresh_task.done():
+                    logger.info("Auth token is stale, refreshing in background")
+                    self._refresh_task = asyncio.create_task(self._refresh_with_lock())
+            else:
+                logger.info("Using cached auth token")
             return self.auth_token
-            
-        # Need to get a new token
+        
+        # Expired (or the last refresh failed): refresh before returning
+        return await self._refresh_with_lock()
+
+    async def _refresh_with_lock(self) -> str:
+        """
+        Refresh the token unless another caller already did while we waited for the lock.
+        """
+        if self._refresh_lock is None:
+            self._refresh_lock = asyncio.Lock()
+        async with self._refresh_lock:
+            age = time.time() - self.token_last_refreshed
+            if self.auth_token and self.last_refresh_succeeded and age < self.token_stale_fraction * self.token_refresh_interval:
+                return self.auth_token
+            return await self._do_refresh()
+
+    async def _do_refresh(self) -> str:
+        """
+        Fetch a new auth token and record whether the refresh succeeded.
+        """
         logger.info("Getting fresh auth token")
         try:
             # In a real implementation, you would make a request to get a new token
             # For now, just refresh the cached time
-            self.token_last_refreshed = current_time
             self.auth_token = self.api_key  # Just use the API key as is
+            self._set_auth_headers(self.auth_token)
+            self.token_last_refreshed = time.time()
+            self.last_refresh_succeeded = True
             
             return self.auth_token
         except Exception as e:
             logger.error(f"Error getting auth token: {str(e)}")
+            # Force the next caller to refresh synchronously
+            self.last_refresh_succeeded = False
+            if self._headers is None:
+                self._set_auth_headers(self.api_key)
             # Fall back to the API key if token refresh fails
             return self.api_key
     
-    async def agent_chat(self, message: str, candidate_data: Dict[str, Any] = None, conversation_history: List[Dict[str, str]] = None) -> str:
+    def _set_auth_headers(self, token: str) -> None:
+        """
+        Build the per-request auth header and masked token for logging once per token refresh.
+        Content-Type is a default header on the shared client.
+        """
+        self._headers = {
+            "Authorization": f"Bearer {token}"
+        }
+        self._masked_token = f"{token[:5]}...{token[-5:]}" if token else "None"
+    
+    async def agent_chat(self, message: str, candidate_data: Dict[str, Any] = None, conversation_history: List[Dict[str, str]] = None, candidate_formatted: Optional[Dict[str, Any]] = None, session_id: str = DEFAULT_SESSION) -> str:
         """
         Send a message to the agent with candidate data properly bridged and maintain conversation context.
         This is a unified method for communicating with the agent that ensures data is always available.
         """
         try:
-            logger.info(f"Sending message to agent: {message[:50]}...")
-            logger.info(f"Has candidate data: {candidate_data is not None}")
-            
-            if candidate_data:
-                logger.info(f"Candidate data keys: {list(candidate_data.keys())}")
-                if 'analysis' in candidate_data:
-                    logger.info(f"Analysis keys: {list(candidate_data['analysis'].keys())}")
-                    score = candidate_data['analysis'].get('overall_fit_score', 'Not found')
-                    logger.info(f"Overall score in data: {score}")
-
-            # Get auth token
-            auth_token = await self.get_auth_token()
-            logger.info(f"Using auth token: {auth_token[:5]}...{auth_token[-5:] if auth_token else 'None'}")
-            
-            headers = {
-                "Authorization": f"Bearer {auth_token}",
-                "Content-Type": "application/json"
-            }
-            
-            # Use passed conversation history or the stored one
-            messages = conversation_history or self.conversation_context or []
-            logger.info(f"Starting with {len(messages)} messages in conversation")
-            
-            # If we have candidate data, ensure it's included in the conversation
-            if candidate_data:
-                # Create a clear, structured data format for the agent
-                formatted_data = self.format_candidate_data(candidate_data)
-                logger.info(f"Formatted data: {json.dumps(formatted_data, indent=2)}")
-                data_prefix = f"CANDIDATE DATA: {json.dumps(formatted_data, indent=2)}"
-                
-                # Add system message if not already present
-                if not messages or messages[0].get('role') != 'system':
-                    logger.info("Adding system message with instructions")
-                    messages.insert(0, {
-                        "role": "system",
-                        "content": "You are a recruiter assistant that analyzes candidate resumes. " +
-                                  "Use the candidate data to make informed assessments and answer questions accurately."
-                    })
-                
-                # Check if first user message already contains our data
-                if messages and any(msg.get('role') == 'user' for msg in messages):
-                    has_data = False
-                    for msg in messages:
-                        if msg.get('role') == 'user' and 'CANDIDATE DATA' in msg.get('content', ''):
-                            has_data = True
-                            logger.info("Found existing candidate data in conversation")
-                            break
-                    
-                    # If no message has our data prefix, add it to the first user message
-                    if not has_data:
-                        logger.info("Adding data to first user message")
-                        for msg in messages:
-                            if msg.get('role') == 'user':
-                                msg['content'] = f"{data_prefix}\n\n{msg['content']}"
-                                break
-            
-            # Add the current message
-            if candidate_data:
-                logger.info("Adding current message with candidate data")
-                messages.append({
-                    "role": "user",
-                    "content": f"{data_prefix}\n\n{message}"
-                })
-            else:
-                logger.info("Adding current message without candidate data")
-                messages.append({
-                    "role": "user",
-                    "content": message
-                })
+            history, user_message, messages, serialized_data = await self._prepare_chat(message, candidate_data, conversation_history, candidate_formatted, session_id)
             
             # Prepare the payload
             payload = {
@@ -138,160 +638,196 @@ class AIService:
                 "stream": False
             }
             
-            # Log the actual messages being sent
-            logger.info(f"Sending {len(messages)} messages to agent")
-            for i, msg in enumerate(messages):
-                logger.info(f"Message {i+1}: role={msg.get('role')}, content_length={len(msg.get('content', ''))}")
-                # Log the beginning of each message to help debug
-                content_preview = msg.get('content', '')[:100] + ("..." if len(msg.get('content', '')) > 100 else "")
-                logger.info(f"Content preview: {content_preview}")
-            
             # Call the API
-            logger.info(f"Sending request to agent: {self.api_url}")
-            response = requests.post(self.api_url, headers=headers, json=payload, timeout=30)
+            logger.info("Sending request to agent: %s", self.api_url)
+            response = await self._client.post(self.api_url, headers=self._headers, content=orjson.dumps(payload), timeout=httpx.Timeout(30.0, connect=5.0))
             
-            logger.info(f"Agent response status: {response.status_code}")
+            logger.info("Agent response status: %d", response.status_code)
             
             if response.status_code != 200:
-                logger.error(f"Agent returned error: {response.status_code}")
-                logger.error(f"Response content: {response.text}")
+                logger.error("Agent returned error: %d", response.status_code)
+                logger.error("Response content: %s", response.text)
                 return f"Error: Failed to get response from agent (Status {response.status_code})"
             
             # Parse the response
-            response_data = response.json()
+            response_data = orjson.loads(response.content)
             assistant_message = response_data.get("choices", [{}])[0].get("message", {})
             
             # Log the response
-            content_preview = assistant_message.get("content", '')[:100] + ("..." if len(assistant_message.get("content", '')) > 100 else "")
-            logger.info(f"Agent response: {content_preview}")
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Agent response: %s", _preview(assistant_message.get("content") or ""))
             
-            # Update the conversation context with the assistant's response
-            messages.append(assistant_message)
-            self.conversation_context = messages
-            logger.info(f"Updated conversation context, now has {len(messages)} messages")
+            self._commit_turn(history, user_message, assistant_message, session_id, serialized_data)
             
             return assistant_message.get("content", "No response from agent")
         except Exception as e:
             logger.error(f"Error in agent_chat: {str(e)}", exc_info=True)
             return f"Error communicating with agent: {str(e)}"
     
-    def format_candidate_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
+    async def agent_chat_stream(self, message: str, candidate_data: Dict[str, Any] = None, conversation_history: List[Dict[str, str]] = None, candidate_formatted: Optional[Dict[str, Any]] = None, session_id: str = DEFAULT_SESSION) -> AsyncIterator[str]:
         """
-        Format candidate data into a clean, structured format that's easy for the agent to use.
+        Stream the agent's reply as text deltas using the provider's SSE mode.
+        The full reply is committed to the conversation context once the stream completes.
         """
         try:
-            # Check if data is the right structure
-            if not data or not isinstance(data, dict):
-                logger.warning(f"Invalid data format: {type(data)}")
-                return {"error": "Invalid data format"}
-            
-            # Convert Pydantic model to dict if needed
-            if hasattr(data, 'dict'):
-                data = data.dict()
-            
-            # Format the data in a simplified structure
-            formatted_data = {}
-            
-            # Extract data from analysis
-            if "analysis" in data:
-                analysis = data["analysis"]
-                formatted_data["overall_score"] = analysis.get("overall_fit_score", 0)
-                formatted_data["experience_level"] = analysis.get("experience_level", "Unknown")
-                formatted_data["education_score"] = analysis.get("education", 0)
-                formatted_data["cultural_fit"] = analysis.get("cultural_fit", 0)
-                
-                # Process technical skills
-                if "technical_skills" in analysis:
-                    tech_skills = analysis["technical_skills"]
-                    formatted_data["skills"] = []
-                    
-                    # Process each skill category
-                    for category in ["programming_languages", "frameworks", "cloud_and_devops", "tools"]:
-                        if category in tech_skills and isinstance(tech_skills[category], dict):
-                            for skill, score in tech_skills[category].items():
-                                formatted_data["skills"].append({
-                                    "name": skill,
-                                    "type": category,
-                                    "score": score
-                                })
-            
-            # Process structured data
-            if "structured_data" in data:
-                structured = data["structured_data"]
-                
-                # Process education
-                if "education" in structured:
-                    formatted_data["education"] = []
-                    for edu in structured["education"]:
-                        if isinstance(edu, dict):
-                            formatted_data["education"].append({
-                                "degree": edu.get("degree", "Unknown"),
-                                "institution": edu.get("school", edu.get("institution", "Unknown")),
-                                "year": edu.get("year", "Unknown")
-                            })
-                
-                # Process experience
-                if "experience" in structured:
-                    formatted_data["experience"] = []
-                    for exp in structured["experience"]:
-                        if isinstance(exp, dict):
-                            formatted_data["experience"].append({
-                                "title": exp.get("title", "Unknown"),
-                                "company": exp.get("company", "Unknown"),
-                                "duration": exp.get("duration", "Unknown")
-                            })
-            
-            # Generate a comprehensive summary
-            summary_parts = []
-            
-            # Add overall assessment
-            if "overall_score" in formatted_data:
-                score = formatted_data["overall_score"]
-                if score >= 90:
-                    assessment = "Outstanding"
-                elif score >= 80:
-                    assessment = "Strong"
-                elif score >= 70:
-                    assessment = "Good"
-                else:
-                    assessment = "Fair"
-                summary_parts.append(f"{assessment} candidate with overall score of {score}/100")
-            
-            # Add experience level
-            if "experience_level" in formatted_data:
-                summary_parts.append(f"Experience Level: {formatted_data['experience_level']}")
+            history, user_message, messages, serialized_data = await self._prepare_chat(message, candidate_data, conversation_history, candidate_formatted, session_id)
             
-            # Add top skills
-            if "skills" in formatted_data:
-                top_skills = [skill["name"] for skill in formatted_data["skills"] if skill["score"] >= 8][:3]
-                if top_skills:
-                    summary_parts.append(f"Top Skills: {', '.join(top_skills)}")
-            
-            # Add latest education
-            if formatted_data.get("education"):
-                latest_edu = formatted_data["education"][0]
-                summary_parts.append(f"Education: {latest_edu['degree']} from {latest_edu['institution']}")
-            
-            # Add latest experience
-            if formatted_data.get("experience"):
-                latest_exp = formatted_data["experience"][0]
-                summary_parts.append(f"Latest Role: {latest_exp['title']} at {latest_exp['company']}")
-            
-            # Add cultural fit if high
-            if "cultural_fit" in formatted_data and formatted_data["cultural_fit"] >= 80:
-                summary_parts.append("Strong cultural fit")
-            
-            # Combine all parts into a final summary
-            formatted_data["summary"] = " | ".join(summary_parts)
+            payload = {
+                "messages": messages,
+                "temperature": 0.3,
+                "max_tokens": 1000,
+                "stream": True
+            }
             
-            return formatted_data
+            logger.info("Streaming request to agent: %s", self.api_url)
+            reply_parts = []
+            async for delta in self._stream_deltas(payload):
+                reply_parts.append(delta)
+                yield delta
             
+            self._commit_turn(history, user_message, {"role": "assistant", "content": "".join(reply_parts)}, session_id, serialized_data)
         except Exception as e:
-            logger.error(f"Error formatting candidate data: {str(e)}", exc_info=True)
-            return {
-                "error": "Error formatting data",
-                "summary": "Error occurred while processing candidate data"
+            logger.error(f"Error in agent_chat_stream: {str(e)}", exc_info=True)
+            yield f"Error communicating with agent: {str(e)}"
+    
+    async def _prepare_chat(self, message: str, candidate_data: Optional[Dict[str, Any]], conversation_history: Optional[List[Dict[str, str]]], candidate_formatted: Optional[Dict[str, Any]] = None, session_id: str = DEFAULT_SESSION) -> Tuple[List[Dict[str, Any]], Dict[str, str], List[Dict[str, Any]], Optional[str]]:
+        """
+        Refresh the auth token and build the outgoing message list for a chat turn.
+        Returns the committed history, the new user message, the messages to send and
+        the serialized candidate data sent with them.
+        Pre-formatted candidate data (see format_candidate_data) is used as-is, reading
+        its cached "_serialized" encoding when present. When no candidate data is given,
+        the last candidate data sent in the session is used.
+        """
+        debug_enabled = logger.isEnabledFor(logging.DEBUG)
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Sending message to agent: %s", _preview(message, 50))
+        logger.info("Has candidate data: %s", candidate_data is not None)
+        
+        if candidate_data and debug_enabled:
+            logger.debug("Candidate data keys: %s", list(candidate_data.keys()))
+            if 'analysis' in candidate_data:
+                logger.debug("Analysis keys: %s", list(candidate_data['analysis'].keys()))
+                logger.debug("Overall score in data: %s", candidate_data['analysis'].get('overall_fit_score', 'Not found'))
+
+        # Fetch the auth token while the candidate data is formatted off the event loop
+        token_task = asyncio.create_task(self.get_auth_token())
+        formatted_data = None
+        serialized_data = None
+        if candidate_formatted:
+            formatted_data = candidate_formatted
+            serialized_data = candidate_formatted.get("_serialized") or orjson.dumps(candidate_formatted).decode()
+        elif candidate_data:
+            formatted_data, serialized_data = await self._get_formatted_candidate(candidate_data)
+        else:
+            serialized_data = self._session_candidates.get(session_id)
+            if serialized_data:
+                logger.info("Reusing candidate data remembered for the session")
+        await token_task
+        if debug_enabled:
+            logger.debug("Using auth token: %s", self._masked_token)
+        
+        # Committed history (system prompt + previous turns). It is only ever appended
+        # to, so the prefix sent to the agent stays byte-identical between turns and the
+        # provider's prompt cache can be reused.
+        history = conversation_history or self.contexts.get(session_id) or []
+        logger.info("Starting with %d messages in conversation", len(history))
+        
+        # Add system message if not already present
+        if serialized_data and (not history or history[0].get('role') != 'system'):
+            logger.info("Adding system message with instructions")
+            history.insert(0, {
+                "role": "system",
+                "content": "You are a recruiter assistant that analyzes candidate resumes. " +
+                          "Use the candidate data to make informed assessments and answer questions accurately."
+            })
+        
+        user_message = {
+            "role": "user",
+            "content": message
+        }
+        
+        # Candidate data is sent as its own message after the committed history and is
+        # never committed, so it can change between turns without invalidating the prefix
+        if serialized_data:
+            if debug_enabled and formatted_data is not None:
+                logger.debug("Formatted data: %s", orjson.dumps(formatted_data, option=orjson.OPT_INDENT_2).decode())
+            logger.info("Adding current message with candidate data")
+            data_message = {
+                "role": "user",
+                "content": f"CANDIDATE DATA: {serialized_data}"
             }
+            messages = history + [data_message, user_message]
+        else:
+            logger.info("Adding current message without candidate data")
+            messages = history + [user_message]
+        
+        # Log the actual messages being sent
+        logger.info("Sending %d messages to agent", len(messages))
+        if debug_enabled:
+            for i, msg in enumerate(messages):
+                logger.debug("Message %d: role=%s, content_length=%d", i + 1, msg.get('role'), len(msg.get('content', '')))
+        
+        return history, user_message, messages, serialized_data
+    
+    def _commit_turn(self, history: List[Dict[str, Any]], user_message: Dict[str, str], assistant_message: Dict[str, Any], session_id: str = DEFAULT_SESSION, serialized_data: Optional[str] = None) -> None:
+        """
+        Append a completed exchange to the session's conversation context and trim it.
+        The candidate-data block is never committed to the history; its serialized form is
+        remembered per session so later turns without candidate data still send it.
+        """
+        history.extend([user_message, assistant_message])
+        self._trim_history(history)
+        self.contexts[session_id] = history
+        self.contexts.move_to_end(session_id)
+        if serialized_data:
+            self._session_candidates[session_id] = serialized_data
+        while len(self.contexts) > self.max_sessions:
+            evicted, _ = self.contexts.popitem(last=False)
+            self._session_candidates.pop(evicted, None)
+        logger.info("Updated conversation context, now has %d messages", len(history))
+    
+    def _trim_history(self, messages: List[Dict[str, Any]]) -> None:
+        """
+        Once the history exceeds max_messages or max_total_chars, drop the oldest
+        user/assistant pairs in place until it is back down to half of both limits.
+        Trimming in blocks keeps the prefix byte-identical between trims, so the
+        provider's prompt cache keeps hitting instead of missing on every turn.
+        A leading system message and the latest exchange are always kept.
+        """
+        sys_offset = 1 if messages and messages[0].get('role') == 'system' else 0
+        
+        total_chars = sum(len(msg.get('content') or '') for msg in messages)
+        if len(messages) - sys_offset <= self.max_messages and total_chars <= self.max_total_chars:
+            return
+        
+        target_messages = self.max_messages // 2
+        target_chars = self.max_total_chars // 2
+        while len(messages) - sys_offset > 2 and (len(messages) - sys_offset > target_messages or total_chars > target_chars):
+            total_chars -= sum(len(msg.get('content') or '') for msg in messages[sys_offset:sys_offset + 2])
+            del messages[sys_offset:sys_offset + 2]
+    
+    async def _get_formatted_candidate(self, candidate_data: Dict[str, Any]) -> Tuple[Dict[str, Any], str]:
+        """
+        Return the formatted candidate data and its compact JSON encoding, cached per candidate.
+        The cache is only touched on the event loop; formatting a miss runs in a worker thread.
+        """
+        key = _canonical_key(candidate_data)
+        
+        cached = self._candidate_cache.get(key)
+        if cached is None:
+            cached = await asyncio.to_thread(_format_and_serialize, candidate_data)
+            if key not in self._candidate_cache and len(self._candidate_cache) >= self.max_cached_candidates:
+                # Evict the oldest entry (dicts keep insertion order)
+                self._candidate_cache.pop(next(iter(self._candidate_cache)), None)
+            self._candidate_cache[key] = cached
+        return cached
+
+    def format_candidate_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Format candidate data into a clean, structured format that's easy for the agent to use.
+        """
+        return format_candidate_data(data)
 
     async def check_health(self) -> bool:
         """
@@ -316,12 +852,8 @@ class AIService:
             logger.info("Testing AI agent endpoint")
             
             # Get auth token
-            auth_token = await self.get_auth_token()
-            
-            headers = {
-                "Authorization": f"Bearer {auth_token}",
-                "Content-Type": "application/json"
-            }
+            await self.get_auth_token()
+            headers = self._headers
             
             payload = {
                 "messages": [
@@ -342,15 +874,14 @@ class AIService:
             
             logger.info(f"Sending test request to: {self.api_url}")
             # Only log a portion of the token for security
-            masked_token = auth_token[:5] + "..." + auth_token[-5:] if auth_token else "None"
-            logger.info(f"Using token: {masked_token}")
+            logger.info(f"Using token: {self._masked_token}")
             
-            response = requests.post(self.api_url, headers=headers, json=payload, timeout=10)
+            response = await self._client.post(self.api_url, headers=headers, content=orjson.dumps(payload), timeout=httpx.Timeout(10.0, connect=5.0))
             logger.info(f"Response status: {response.status_code}")
             
             if response.status_code == 200:
                 logger.info("Endpoint test successful")
-                return {"status": "success", "response": response.json()}
+                return {"status": "success", "response": orjson.loads(response.content)}
             else:
                 logger.error(f"Endpoint test failed: {response.text}")
                 return {"status": "error", "code": response.status_code, "text": response.text}
@@ -361,6 +892,30 @@ class AIService:
     async def analyze_candidate(self, resume_content: str) -> Dict[str, Any]:
         """
         Analyze a resume using the DigitalOcean AI agent.
+        Concurrent calls for the same resume share a single agent request.
+        """
+        key = "analyze:" + hashlib.blake2b(resume_content.encode(), digest_size=16).hexdigest()
+        return await self._single_flight(key, lambda: self._analyze_candidate(resume_content))
+
+    async def _single_flight(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run factory() at most once at a time per key; concurrent callers with the same key
+        await the running call and share its exception, or each get their own deep copy of
+        its result so one caller mutating it can't affect the others.
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._inflight.pop(key) if self._inflight.get(key) is done else None)
+        else:
+            logger.info(f"Joining in-flight request {key}")
+        # Shield so one caller going away doesn't cancel the request for the others
+        return copy.deepcopy(await asyncio.shield(task))
+
+    async def _analyze_candidate(self, resume_content: str) -> Dict[str, Any]:
+        """
+        Run a single analysis request; see analyze_candidate.
         """
         try:
             # Only use DigitalOcean agent for analysis
@@ -379,18 +934,16 @@ class AIService:
         """
         Internal method to get analysis from DigitalOcean agent.
         """
-        # Check agent health
-        if not await self.check_health() and not self.use_mock:
-            raise Exception("AI agent is not healthy or accessible")
-            
         if self.use_mock:
             return self._get_mock_analysis()
 
+        # Check agent health while the auth token is fetched
+        healthy, _ = await asyncio.gather(self.check_health(), self.get_auth_token())
+        if not healthy:
+            raise Exception("AI agent is not healthy or accessible")
+
         try:
-            headers = {
-                "Authorization": f"Bearer {self.api_key}",
-                "Content-Type": "application/json"
-            }
+            headers = self._headers
 
             # Prepare the chat message for analysis
             messages = [
@@ -404,18 +957,18 @@ class AIService:
                 }
             ]
 
-            response = requests.post(
+            response = await self._client.post(
                 self.api_url,
                 headers=headers,
-                json={
+                content=orjson.dumps({
                     "messages": messages,
                     "temperature": 0.1,
                     "max_tokens": 1000
-                }
+                })
             )
 
             if response.status_code == 200:
-                return self._parse_agent_response(response.json())
+                return self._parse_agent_response(orjson.loads(response.content))
             else:
                 raise Exception(f"Agent API error: {response.status_code} - {response.text}")
 
@@ -455,12 +1008,20 @@ class AIService:
     async def set_agent_memory(self, data: Dict[str, Any]) -> bool:
         """
         Send data to the agent by using our improved agent bridge.
+        Concurrent calls with identical data share a single agent request.
+        """
+        return await self._single_flight(_canonical_key(data, "agent_memory"), lambda: self._set_agent_memory(data))
+
+    async def _set_agent_memory(self, data: Dict[str, Any]) -> bool:
+        """
+        Send one agent memory initialization; see set_agent_memory.
         """
         try:
             logger.info("Setting agent memory using agent bridge")
             
-            # Format the data using our standard formatter
-            formatted_data = self.format_candidate_data(data)
+            # Format the data using our standard formatter off the event loop,
+            # reusing the cached result for candidates that were already formatted
+            formatted_data, serialized_data = await self._get_formatted_candidate(data)
             
             if not formatted_data or "error" in formatted_data:
                 logger.error(f"Failed to format candidate data: {formatted_data}")
@@ -475,8 +1036,9 @@ class AIService:
                 "and at least three key skills from the data."
             )
             
-            # Send the initialization message with the formatted data
-            response = await self.agent_chat(init_message, candidate_data=formatted_data)
+            # Send the pre-formatted data as-is with its cached serialization
+            candidate_formatted = {**formatted_data, "_serialized": serialized_data}
+            response = await self.agent_chat(init_message, candidate_formatted=candidate_formatted)
             
             if "error" in response.lower():
                 logger.error(f"Failed to set agent memory: {response}")
@@ -495,9 +1057,10 @@ class AIService:
             logger.error(f"Error setting agent memory: {str(e)}")
             return False
 
-    async def generate_interview_questions(self, structured_data: Dict[str, Any]) -> Dict[str, list]:
+    async def generate_interview_package(self, structured_data: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Generate interview questions based on the resume analysis.
+        Generate interview questions and schedule recommendations in a single agent call.
+        Returns {"questions": {...}, "schedule": {...}}, or an error dict if the response can't be parsed.
         """
         # First check if the agent is healthy
         if not await self.check_health() and not self.use_mock:
@@ -505,116 +1068,245 @@ class AIService:
             
         # Use mock data if in mock mode
         if self.use_mock:
-            return {
-                "technicalQuestions": [
-                    "Can you explain your experience with Python and how you've used it in previous projects?",
-                    "Describe your experience with React and component lifecycle management.",
-                    "How have you utilized AWS services in your previous roles?",
-                    "Explain your approach to database design and optimization."
-                ],
-                "behavioralQuestions": [
-                    "Tell me about a time when you had to meet a tight deadline.",
-                    "How do you handle disagreements with team members?",
-                    "Describe a situation where you had to learn a new technology quickly."
-                ],
-                "culturalFitQuestions": [
-                    "What type of work environment helps you thrive?",
-                    "How do you prioritize work-life balance?",
-                    "What values are most important to you in a company culture?"
-                ]
-            }
+            return self._get_mock_interview_package()
 
+        # Only the fields the prompt needs are sent, which also makes the cache key
+        # ignore changes to fields that don't affect the result
+        analysis = _slim_analysis(structured_data)
+        
+        # Identical analyses get the package generated for them within the TTL. The cache holds
+        # the InterviewPackage struct and every caller gets freshly built dicts, so mutating a
+        # result can't corrupt the cached package.
+        cache_key = _canonical_key(analysis, "interview_package")
+        cached = self._response_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Using cached interview package")
+            return msgspec.to_builtins(cached)
+
+        # Concurrent requests for the same analysis share one agent call
+        result = await self._single_flight(cache_key, lambda: self._generate_interview_package(analysis, cache_key))
+        return msgspec.to_builtins(result) if isinstance(result, InterviewPackage) else result
+
+    async def _generate_interview_package(self, analysis: Dict[str, Any], cache_key: str) -> Any:
+        """
+        Request, parse and cache one interview package; see generate_interview_package.
+        Returns the InterviewPackage struct, or an error dict if the response can't be parsed.
+        """
         try:
             # Get auth token
-            auth_token = await self.get_auth_token()
-            
-            headers = {
-                "Authorization": f"Bearer {auth_token}",
-                "Content-Type": "application/json"
-            }
+            await self.get_auth_token()
+            headers = self._headers
 
-            payload = {
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "You are an interview preparation assistant. Generate relevant interview questions based on the resume analysis."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Please generate interview questions based on this resume analysis. Format the response as a JSON object with these fields:\n- technicalQuestions: array of strings\n- behavioralQuestions: array of strings\n- culturalFitQuestions: array of strings\n\nResume analysis:\n\n{json.dumps(structured_data)}"
-                    }
-                ],
-                "temperature": 0.7,
-                "top_p": 0.9,
-                "max_tokens": 1000,
-                "stream": False
-            }
+            payload = self._interview_package_payload(analysis, stream=False)
 
-            response = requests.post(self.api_url, headers=headers, json=payload, timeout=30)
+            response = await self._client.post(self.api_url, headers=headers, content=orjson.dumps(payload), timeout=httpx.Timeout(30.0, connect=5.0))
+            
+            if "response_format" in payload and _rejects_request_option(response.status_code):
+                # The endpoint may not support structured output; retry this request once without it
+                self._response_format_rejected(response.status_code, response.text)
+                payload = self._interview_package_payload(analysis, stream=False, response_format=False)
+                response = await self._client.post(self.api_url, headers=headers, content=orjson.dumps(payload), timeout=httpx.Timeout(30.0, connect=5.0))
             
             if response.status_code != 200:
                 logger.error(f"AI agent returned error: {response.status_code}")
                 logger.error(f"Response content: {response.text}")
                 raise Exception(f"AI agent returned error: {response.status_code}")
                 
-            response_data = response.json()
+            response_data = orjson.loads(response.content)
             
             # Parse the response content
             content = response_data.get("choices", [{}])[0].get("message", {}).get("content", "{}")
             
-            # Try to parse as JSON
+            # Parse and validate against the InterviewPackage struct. Endpoints without structured
+            # output may still fence or loosely format the JSON, so keep the lenient parser.
             try:
-                # If the content is a string containing JSON with backticks, remove them
-                if content.startswith("```json") and content.endswith("```"):
-                    content = content[7:-3].strip()
-                elif content.startswith("```") and content.endswith("```"):
-                    content = content[3:-3].strip()
-                    
-                # Parse JSON
-                questions = json.loads(content)
-                return questions
-            except json.JSONDecodeError:
-                # Try eval as fallback
-                try:
-                    questions = eval(content)
-                    return questions
-                except:
-                    return {"error": "Failed to parse AI response", "raw_content": content}
-        except Exception as e:
-            logger.error(f"Error in generate_interview_questions: {str(e)}")
-            if self.use_mock:
+                package = _parse_llm_json(content, InterviewPackage)
+                self._response_cache.set(cache_key, package)
+                return package
+            except ValueError as e:
+                logger.warning(f"Could not parse interview package: {str(e)}")
                 return {
-                    "technicalQuestions": [
-                        "Can you explain your experience with Python and how you've used it in previous projects?",
-                        "Describe your experience with React and component lifecycle management.",
-                        "How have you utilized AWS services in your previous roles?",
-                        "Explain your approach to database design and optimization."
-                    ],
-                    "behavioralQuestions": [
-                        "Tell me about a time when you had to meet a tight deadline.",
-                        "How do you handle disagreements with team members?",
-                        "Describe a situation where you had to learn a new technology quickly."
-                    ],
-                    "culturalFitQuestions": [
-                        "What type of work environment helps you thrive?",
-                        "How do you prioritize work-life balance?",
-                        "What values are most important to you in a company culture?"
-                    ]
+                    "error": "Failed to parse AI response",
+                    "raw_content": content[:MAX_RAW_CONTENT_CHARS],
+                    "truncated": len(content) > MAX_RAW_CONTENT_CHARS
                 }
+        except Exception as e:
+            logger.error(f"Error in generate_interview_package: {str(e)}")
+            if self.use_mock:
+                return self._get_mock_interview_package()
             else:
                 raise
 
-    async def schedule_interview(self, structured_data: Dict[str, Any]) -> Dict[str, Any]:
+    def _response_format_rejected(self, status_code: int, body: str) -> None:
         """
-        Generate interview schedule recommendations.
+        Log a 4xx on a response_format request. Structured output is only switched off for the
+        process when the error names the field; other errors (context length, payload size)
+        say nothing about support for it.
         """
-        # First check if the agent is healthy
-        if not await self.check_health() and not self.use_mock:
+        if _names_response_format(body):
+            logger.warning(f"AI agent rejected response_format ({status_code}), disabling structured output")
+            self.use_response_format = False
+        else:
+            logger.warning(f"AI agent returned {status_code} for a response_format request, retrying without it")
+
+    def _interview_package_payload(self, analysis: Dict[str, Any], stream: bool, response_format: bool = True) -> Dict[str, Any]:
+        """
+        Build the agent request for an interview package from a slimmed analysis.
+        """
+        payload = {
+            "messages": [
+                {
+                    "role": "system",
+                    "content": "You are an interview assistant. Generate relevant interview questions and interview schedule recommendations based on the resume analysis."
+                },
+                {
+                    "role": "user",
+                    "content": f"Please generate interview questions and interview schedule recommendations based on this resume analysis. Format the response as a JSON object with these fields:\n- questions: object with\n  - technicalQuestions: array of strings\n  - behavioralQuestions: array of strings\n  - culturalFitQuestions: array of strings\n- schedule: object with\n  - recommendedDuration: string\n  - suggestedTimeSlots: array of strings\n  - interviewType: string\n\nResume analysis:\n\n{orjson.dumps(analysis).decode()}"
+                }
+            ],
+            "temperature": 0.7,
+            "top_p": 0.9,
+            "max_tokens": 1500,
+            "stream": stream
+        }
+        if response_format and self.use_response_format:
+            payload["response_format"] = _INTERVIEW_PACKAGE_FORMAT
+        return payload
+
+    async def stream_interview_package(self, structured_data: Dict[str, Any]) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream an interview package as its parts are generated.
+        Yields {"type": "question", "category": ..., "question": ...} as each question completes,
+        {"type": "questions", ...} and {"type": "schedule", ...} as each section completes, and
+        finally {"type": "package", "package": ...} with the validated package, or
+        {"type": "error", ...} if the response can't be parsed.
+        """
+        if self.use_mock:
+            for event in _package_events(self._get_mock_interview_package()):
+                yield event
+            return
+        
+        if not await self.check_health():
             raise Exception("AI agent is not healthy or accessible")
+        
+        analysis = _slim_analysis(structured_data)
+        cache_key = _canonical_key(analysis, "interview_package")
+        cached = self._response_cache.get(cache_key)
+        if cached is not None:
+            logger.info("Using cached interview package")
+            for event in _package_events(msgspec.to_builtins(cached)):
+                yield event
+            return
+        
+        await self.get_auth_token()
+        payload = self._interview_package_payload(analysis, stream=True)
+        
+        parts = []
+        scanner = _JSONMemberStream(max_depth=3, root_keys=("questions", "schedule"))
+        try:
+            async for event in self._stream_package_events(payload, parts, scanner):
+                yield event
+        except AgentHTTPError as e:
+            # The endpoint may not support structured output; retry once without it
+            if "response_format" not in payload or not _rejects_request_option(e.status_code):
+                raise
+            self._response_format_rejected(e.status_code, e.body)
+            payload = self._interview_package_payload(analysis, stream=True, response_format=False)
+            async for event in self._stream_package_events(payload, parts, scanner):
+                yield event
+        
+        content = "".join(parts)
+        try:
+            package = _parse_llm_json(content, InterviewPackage)
+        except ValueError as e:
+            logger.warning(f"Could not parse streamed interview package: {str(e)}")
+            yield {
+                "type": "error",
+                "error": "Failed to parse AI response",
+                "raw_content": content[:MAX_RAW_CONTENT_CHARS],
+                "truncated": len(content) > MAX_RAW_CONTENT_CHARS
+            }
+            return
+        self._response_cache.set(cache_key, package)
+        yield {"type": "package", "package": msgspec.to_builtins(package)}
+
+    async def _stream_package_events(self, payload: Dict[str, Any], parts: List[str], scanner: "_JSONMemberStream") -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream an interview package request, collecting the raw deltas into parts and
+        yielding question and section events as the scanner completes them.
+        """
+        async for delta in self._stream_deltas(payload):
+            parts.append(delta)
+            for path, value in scanner.feed(delta):
+                if len(path) == 3 and path[0] == "questions" and isinstance(value, str):
+                    yield {"type": "question", "category": path[1], "question": value}
+                elif path in (("questions",), ("schedule",)):
+                    yield {"type": path[0], path[0]: value}
+
+    async def _stream_deltas(self, payload: Dict[str, Any]) -> AsyncIterator[str]:
+        """
+        Post a streaming request to the agent and yield the content deltas from its SSE events.
+        """
+        async with self._client.stream("POST", self.api_url, headers=self._headers, content=orjson.dumps(payload)) as response:
+            if response.status_code != 200:
+                body = await response.aread()
+                logger.error("Agent returned error: %d", response.status_code)
+                logger.error("Response content: %s", body.decode(errors="replace"))
+                raise AgentHTTPError(f"Failed to get response from agent (Status {response.status_code})", response.status_code, body.decode(errors="replace"))
             
-        # Use mock data if in mock mode
-        if self.use_mock:
-            return {
+            async for line in response.aiter_lines():
+                if not line.startswith("data: "):
+                    continue
+                data = line[6:]
+                if data == "[DONE]":
+                    break
+                chunk = orjson.loads(data)
+                delta = (chunk.get("choices") or [{}])[0].get("delta", {}).get("content")
+                if delta:
+                    yield delta
+
+    async def generate_interview_questions(self, structured_data: Dict[str, Any]) -> Dict[str, list]:
+        """
+        Generate interview questions based on the resume analysis.
+        """
+        package = await self.generate_interview_package(structured_data)
+        if "error" in package:
+            return package
+        return package.get("questions", {})
+
+    async def schedule_interview(self, structured_data: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Generate interview schedule recommendations.
+        """
+        package = await self.generate_interview_package(structured_data)
+        if "error" in package:
+            return package
+        return package.get("schedule", {})
+
+    def _get_mock_interview_package(self) -> Dict[str, Any]:
+        """
+        Return mock interview questions and schedule for testing.
+        """
+        return {
+            "questions": {
+                "technicalQuestions": [
+                    "Can you explain your experience with Python and how you've used it in previous projects?",
+                    "Describe your experience with React and component lifecycle management.",
+                    "How have you utilized AWS services in your previous roles?",
+                    "Explain your approach to database design and optimization."
+                ],
+                "behavioralQuestions": [
+                    "Tell me about a time when you had to meet a tight deadline.",
+                    "How do you handle disagreements with team members?",
+                    "Describe a situation where you had to learn a new technology quickly."
+                ],
+                "culturalFitQuestions": [
+                    "What type of work environment helps you thrive?",
+                    "How do you prioritize work-life balance?",
+                    "What values are most important to you in a company culture?"
+                ]
+            },
+            "schedule": {
                 "recommendedDuration": "60 minutes",
                 "suggestedTimeSlots": [
                     "Tuesday, May 21, 2025 at 10:00 AM",
@@ -625,74 +1317,12 @@ class AIService:
                 "interviewers": ["Technical Lead", "Hiring Manager"],
                 "preparationNotes": "Candidate has strong technical background, focus on system design and architectural decisions."
             }
+        }
 
-        try:
-            # Get auth token
-            auth_token = await self.get_auth_token()
-            
-            headers = {
-                "Authorization": f"Bearer {auth_token}",
-                "Content-Type": "application/json"
-            }
-
-            payload = {
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "You are an interview scheduling assistant. Generate interview schedule recommendations based on the resume analysis."
-                    },
-                    {
-                        "role": "user",
-                        "content": f"Please generate interview schedule recommendations based on this resume analysis. Format the response as a JSON object with these fields:\n- recommendedDuration: string\n- suggestedTimeSlots: array of strings\n- interviewType: string\n\nResume analysis:\n\n{json.dumps(structured_data)}"
-                    }
-                ],
-                "temperature": 0.7,
-                "top_p": 0.9,
-                "max_tokens": 1000,
-                "stream": False
-            }
-
-            response = requests.post(self.api_url, headers=headers, json=payload, timeout=30)
-            
-            if response.status_code != 200:
-                logger.error(f"AI agent returned error: {response.status_code}")
-                logger.error(f"Response content: {response.text}")
-                raise Exception(f"AI agent returned error: {response.status_code}")
-                
-            response_data = response.json()
-            
-            # Parse the response content
-            content = response_data.get("choices", [{}])[0].get("message", {}).get("content", "{}")
-            
-            # Try to parse as JSON
-            try:
-                # If the content is a string containing JSON with backticks, remove them
-                if content.startswith("```json") and content.endswith("```"):
-                    content = content[7:-3].strip()
-                elif content.startswith("```") and content.endswith("```"):
-                    content = content[3:-3].strip()
-                    
-                # Parse JSON
-                schedule = json.loads(content)
-                return schedule
-            except json.JSONDecodeError:
-                # Try eval as fallback
-                try:
-                    schedule = eval(content)
-                    return schedule
-                except:
-                    return {"error": "Failed to parse AI response", "raw_content": content}
-        except Exception as e:
-            logger.error(f"Error in schedule_interview: {str(e)}")
-            if self.use_mock:
-                return {
-                    "recommendedDuration": "60 minutes",
-                    "suggestedTimeSlots": [
-                        "Tuesday, May 21, 2025 at 10:00 AM",
-                        "Wednesday, May 22, 2025 at 2:00 PM",
-                        "Friday, May 24, 2025 at 11:00 AM"
-                    ],
-                    "interviewType": "Technical and Cultural Fit"
-                }
-            else:
-                raise 
\ No newline at end of file
+@functools.lru_cache(maxsize=1)
+def get_ai_service() -> AIService:
+    """
+    Return the process-wide AIService so the token cache, conversation contexts and
+    connection pool are shared across requests. Usable as a FastAPI dependency.
+    """
+    return AIService(use_mock=False)
@@ -1,8 +1,12 @@
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
 import numpy as np
+import faiss
+import torch
 from sentence_transformers import SentenceTransformer
 import logging
 import os
+import hashlib
+import diskcache
 
 logger = logging.getLogger(__name__)
 
@@ -14,36 +18,196 @@ class EmbeddingService:
             logger.warning("No HUGGINGFACE_TOKEN found in environment variables")
             
         # Initialize the sentence transformer model with token
-        self.model = SentenceTransformer('all-MiniLM-L6-v2', token=hf_token)  # Lightweight model good for semantic search
+        self.model_name = 'all-MiniLM-L6-v2'  # Lightweight model good for semantic search
+        # Split the cores between the uvicorn workers (WEB_CONCURRENCY) so their intra-op pools
+        # don't oversubscribe the machine; EMBEDDING_TORCH_THREADS overrides the derived count.
+        # The same count is given to the ONNX Runtime session on the CPU path.
+        workers = max(1, int(os.getenv('WEB_CONCURRENCY', '1')))
+        torch_threads = int(os.getenv('EMBEDDING_TORCH_THREADS', '0')) or (os.cpu_count() or 1) // workers
+        self.num_threads = max(1, torch_threads)
+        torch.set_num_threads(self.num_threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            # Only settable before any parallel work has run in the process
+            pass
+        
+        if torch.cuda.is_available():
+            # FP16 halves the weight bytes moved per forward pass
+            self.model = SentenceTransformer(self.model_name, token=hf_token, device='cuda').half()
+            self.model_variant = 'cuda-fp16'
+            # Padded batch lengths vary, so compile for dynamic shapes (torch.compile needs torch 2.x)
+            if hasattr(torch, 'compile'):
+                self.model[0].auto_model = torch.compile(self.model[0].auto_model, dynamic=True)
+        else:
+            self.model = self._load_cpu_model(hf_token)
+        self.model.eval()
         self.embeddings_cache = {}  # In-memory cache for embeddings
         
-    def generate_embeddings(self, text: str) -> np.ndarray:
+        # Inner-product index over the normalized cached embeddings, rebuilt lazily after changes
+        self._index: Optional[faiss.IndexFlatIP] = None
+        self._index_keys: List[str] = []
+        
+        # Chunk by real subword tokens, leaving room for the [CLS]/[SEP] tokens the model adds
+        self._tokenizer = self.model.tokenizer
+        self.max_chunk_tokens = self.model.max_seq_length - 2
+        
+        # Persistent cache of embeddings keyed by a hash of the text, survives restarts
+        self.disk_cache = self._open_disk_cache()
+        
+        # Run one forward pass now so lazy initialization and compilation don't land on the first request
+        self._encode(["warmup"], batch_size=1)
+        
+    def _load_cpu_model(self, hf_token: Optional[str]) -> SentenceTransformer:
+        """Load the INT8-quantized ONNX export of the model, falling back to FP32 PyTorch."""
+        onnx_file = os.getenv('EMBEDDING_ONNX_FILE', 'onnx/model_qint8_avx512_vnni.onnx')
+        try:
+            import onnxruntime
+            # ONNX Runtime ignores torch's settings and defaults to one thread per core
+            session_options = onnxruntime.SessionOptions()
+            session_options.intra_op_num_threads = self.num_threads
+            session_options.inter_op_num_threads = 1
+            model = SentenceTransformer(
+                self.model_name,
+                token=hf_token,
+                backend='onnx',
+                model_kwargs={'file_name': onnx_file, 'session_options': session_options}
+            )
+            self.model_variant = 'onnx-' + os.path.splitext(os.path.basename(onnx_file))[0]
+            return model
+        except Exception as e:
+            logger.warning(f"Quantized ONNX model unavailable ({onnx_file}), using PyTorch: {str(e)}")
+            self.model_variant = 'torch-fp32'
+            return SentenceTransformer(self.model_name, token=hf_token)
+
+    def _encode(self, chunks: List[str], batch_size: int) -> np.ndarray:
+        """Encode chunks without autograd bookkeeping, always returning float32."""
+        with torch.inference_mode():
+            embeddings = self.model.encode(chunks, batch_size=batch_size, show_progress_bar=False, convert_to_numpy=True)
+        # The FP16 CUDA model returns float16; averaging and caching work in float32
+        return embeddings.astype(np.float32, copy=False)
+
+    def _open_disk_cache(self) -> Optional[diskcache.Cache]:
+        """Open the on-disk embedding cache, one directory per model and precision/backend."""
+        cache_dir = os.path.join(os.getenv('EMBEDDING_CACHE_DIR', '/var/cache/embeddings'), self.model_name, self.model_variant)
+        try:
+            return diskcache.Cache(cache_dir)
+        except Exception as e:
+            logger.warning(f"Persistent embedding cache disabled ({cache_dir}): {str(e)}")
+            return None
+
+    @staticmethod
+    def _text_key(text: str) -> str:
+        return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+    def _cache_get(self, key: str) -> Optional[np.ndarray]:
+        if self.disk_cache is None:
+            return None
+        try:
+            raw = self.disk_cache.get(key)
+        except Exception as e:
+            logger.warning(f"Error reading embedding cache: {str(e)}")
+            return None
+        return None if raw is None else np.frombuffer(raw, dtype=np.float32)
+
+    def _cache_set(self, key: str, embedding: np.ndarray) -> None:
+        if self.disk_cache is None:
+            return
+        try:
+            self.disk_cache.set(key, embedding.astype(np.float32).tobytes())
+        except Exception as e:
+            logger.warning(f"Error writing embedding cache: {str(e)}")
+
+    def generate_embeddings(self, text: str) -> Optional[np.ndarray]:
         """Generate embeddings for a given text."""
+        key = self._text_key(text)
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        
         try:
             # Split text into chunks if it's too long (model has a max length)
             chunks = self._split_text(text)
+            if not chunks:
+                # Empty or whitespace-only text has nothing to embed; the mean of no chunks
+                # would be NaN, so return None (as the bulk path does) and cache nothing
+                return None
             
-            # Generate embeddings for each chunk
-            chunk_embeddings = []
-            for chunk in chunks:
-                embedding = self.model.encode(chunk)
-                chunk_embeddings.append(embedding)
+            # Encode all chunks in one batched forward pass
+            chunk_embeddings = self._encode(chunks, batch_size=max(1, min(32, len(chunks))))
             
             # Average the chunk embeddings to get a single embedding for the text
-            return np.mean(chunk_embeddings, axis=0)
+            embedding = chunk_embeddings.mean(axis=0)
+            self._cache_set(key, embedding)
+            return embedding
         except Exception as e:
             logger.error(f"Error generating embeddings: {str(e)}")
             return None
 
+    def generate_embeddings_bulk(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Generate one embedding per text, encoding the chunks of all texts in a single batch."""
+        try:
+            all_chunks = []
+            counts = []
+            for text in texts:
+                chunks = self._split_text(text)
+                all_chunks.extend(chunks)
+                counts.append(len(chunks))
+            
+            results: List[Optional[np.ndarray]] = [None] * len(texts)
+            if not all_chunks:
+                return results
+            
+            embeddings = self._encode(all_chunks, batch_size=64)
+            
+            # Sum each text's run of chunk rows, then divide by its chunk count.
+            # Texts without chunks are skipped since reduceat can't express empty runs.
+            counts = np.asarray(counts)
+            has_chunks = counts > 0
+            starts = (np.cumsum(counts) - counts)[has_chunks]
+            means = np.add.reduceat(embeddings, starts, axis=0) / counts[has_chunks, None].astype(embeddings.dtype)
+            for i, mean in zip(np.flatnonzero(has_chunks), means):
+                results[i] = mean
+            return results
+        except Exception as e:
+            logger.error(f"Error generating bulk embeddings: {str(e)}")
+            return [None] * len(texts)
+
+    def get_or_compute_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Return embeddings for many texts, encoding only those missing from the persistent cache."""
+        keys = [self._text_key(text) for text in texts]
+        results = [self._cache_get(key) for key in keys]
+        
+        # Encode each distinct missing text once
+        misses: Dict[str, str] = {}
+        for key, text, result in zip(keys, texts, results):
+            if result is None:
+                misses.setdefault(key, text)
+        if not misses:
+            return results
+        
+        computed = dict(zip(misses, self.generate_embeddings_bulk(list(misses.values()))))
+        if self.disk_cache is not None:
+            try:
+                with self.disk_cache.transact():
+                    for key, embedding in computed.items():
+                        if embedding is not None:
+                            self.disk_cache.set(key, embedding.astype(np.float32).tobytes())
+            except Exception as e:
+                logger.warning(f"Error writing embedding cache: {str(e)}")
+        
+        return [computed[key] if result is None else result for key, result in zip(keys, results)]
+
     def store_embeddings(self, key: str, text: str) -> bool:
         """Store embeddings in memory cache."""
         try:
             embedding = self.generate_embeddings(text)
             if embedding is not None:
                 self.embeddings_cache[key] = {
-                    'embedding': embedding,
+                    'embedding': embedding.astype(np.float16),  # Half the memory; upcast when compared
                     'text': text
                 }
+                self._index = None
                 return True
             return False
         except Exception as e:
@@ -54,31 +218,80 @@ class EmbeddingService:
         """Retrieve embeddings from cache."""
         return self.embeddings_cache.get(key)
 
+    def similarity(self, query_key: str, keys: Optional[List[str]] = None) -> Dict[str, float]:
+        """Cosine similarity between one cached embedding and others (all other cached keys by default)."""
+        query = self.embeddings_cache.get(query_key)
+        if query is None:
+            return {}
+        if keys is None:
+            keys = [key for key in self.embeddings_cache if key != query_key]
+        else:
+            keys = [key for key in keys if key in self.embeddings_cache]
+        if not keys:
+            return {}
+        
+        # Stored as float16; compute in float32 for accuracy
+        matrix = np.stack([self.embeddings_cache[key]['embedding'] for key in keys]).astype(np.float32)
+        query_vector = query['embedding'].astype(np.float32)
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query_vector)
+        scores = np.divide(matrix @ query_vector, norms, out=np.zeros(len(keys), dtype=np.float32), where=norms > 0)
+        return dict(zip(keys, scores.tolist()))
+
+    def search(self, text: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Find the k cached entries most similar to a text, as (key, cosine similarity) pairs."""
+        if k <= 0:
+            return []
+        embedding = self.generate_embeddings(text)
+        if embedding is None:
+            return []
+        if self._index is None:
+            self._build_index()
+        if self._index is None or self._index.ntotal == 0:
+            return []
+        
+        query = np.array(embedding, dtype=np.float32).reshape(1, -1)
+        faiss.normalize_L2(query)
+        # FAISS asserts on k <= 0 and pads results past ntotal with -1 ids
+        scores, ids = self._index.search(query, min(k, self._index.ntotal))
+        return [(self._index_keys[i], float(score)) for score, i in zip(scores[0], ids[0]) if i >= 0]
+
+    def _build_index(self) -> None:
+        """Index the cached embeddings; inner product of normalized vectors is cosine similarity."""
+        keys = list(self.embeddings_cache)
+        if not keys:
+            self._index, self._index_keys = None, []
+            return
+        vectors = np.stack([self.embeddings_cache[key]['embedding'] for key in keys]).astype(np.float32)
+        faiss.normalize_L2(vectors)
+        index = faiss.IndexFlatIP(vectors.shape[1])
+        index.add(vectors)
+        self._index, self._index_keys = index, keys
+
     def clear_embeddings(self, key: str = None):
         """Clear embeddings from cache."""
         if key:
             self.embeddings_cache.pop(key, None)
         else:
             self.embeddings_cache.clear()
+        self._index = None
 
-    def _split_text(self, text: str, max_length: int = 512) -> List[str]:
-        """Split text into chunks of maximum length."""
-        words = text.split()
-        chunks = []
-        current_chunk = []
-        current_length = 0
+    def _split_text(self, text: str, max_length: Optional[int] = None, overlap: int = 64) -> List[str]:
+        """Split text into overlapping chunks of at most max_length model tokens."""
+        if max_length is None:
+            max_length = self.max_chunk_tokens
         
-        for word in words:
-            word_length = len(word.split())
-            if current_length + word_length > max_length:
-                chunks.append(' '.join(current_chunk))
-                current_chunk = [word]
-                current_length = word_length
-            else:
-                current_chunk.append(word)
-                current_length += word_length
+        ids = self._tokenizer.encode(text, add_special_tokens=False)
+        if not ids:
+            return []
+        if len(ids) <= max_length:
+            return [text]
         
-        if current_chunk:
-            chunks.append(' '.join(current_chunk))
+        # Slide a window over the token ids, overlapping so context isn't cut at boundaries
+        stride = max(1, max_length - overlap)
+        chunks = []
+        for start in range(0, len(ids), stride):
+            chunks.append(self._tokenizer.decode(ids[start:start + max_length]))
+            if start + max_length >= len(ids):
+                break
         
-        return chunks 
\ No newline at end of file
+        return chunks
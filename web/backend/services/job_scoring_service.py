@@ -1,10 +1,88 @@
 import logging
+import re
 from typing import Dict, Any, List, Optional
-from datetime import datetime
+import time
+from datetime import datetime, timezone
+import numpy as np
+from numba import njit
 
 logger = logging.getLogger(__name__)
 
+@njit(cache=True, fastmath=True)
+def _score_kernel(candidate_levels, required_levels):
+    """
+    Percentage of requirements met: full credit per met requirement, partial credit otherwise.
+    """
+    total = 0.0
+    n = required_levels.size
+    for i in range(n):
+        candidate = candidate_levels[i]
+        required = required_levels[i]
+        if candidate >= required:
+            total += 1.0
+        elif required > 0 and candidate > 0:
+            total += candidate / required
+    return total * 100.0 / n
+
+def _requirement_credit(candidate: np.ndarray, required: np.ndarray) -> np.ndarray:
+    """
+    Elementwise version of _score_kernel's per-requirement credit, broadcasting its inputs.
+    """
+    with np.errstate(divide="ignore", invalid="ignore"):
+        partial = np.nan_to_num(np.clip(candidate / required, 0.0, 1.0))
+    return np.where(candidate >= required, 1.0, partial)
+
+# Compile now so the first scoring request doesn't pay for it
+_score_kernel(np.ones(1), np.ones(1))
+
+# (epoch second, ISO timestamp) of the last formatted timestamp
+_timestamp_cache = (-1, "")
+
+def _utc_timestamp() -> str:
+    """
+    Current UTC time as a naive ISO timestamp at second resolution, formatted at most once per second.
+    """
+    global _timestamp_cache
+    second = time.time_ns() // 1_000_000_000
+    if _timestamp_cache[0] != second:
+        _timestamp_cache = (second, datetime.fromtimestamp(second, timezone.utc).replace(tzinfo=None).isoformat())
+    return _timestamp_cache[1]
+
 class JobScoringService:
+    # Required-skill categories in a job spec
+    _SKILL_CATEGORIES = ("programmingLanguages", "frameworks", "cloudAndDevOps", "tools")
+    
+    # Map experience levels and degrees to numeric values
+    _EXPERIENCE_LEVELS = {
+        "Junior": 1,
+        "Mid-level": 2,
+        "Senior": 3,
+        "Lead": 4
+    }
+    _DEGREE_VALUES = {
+        "High School": 1,
+        "Associate": 2,
+        "Bachelor": 3,
+        "Master": 4,
+        "PhD": 5
+    }
+    
+    # Degree keywords and abbreviations, matched as whole words in one pass.
+    # Full words also match their plural/derived forms (bachelors, doctorate).
+    _DEGREE_RE = re.compile(
+        r"(?<![a-z])(?:"
+        r"(bachelor|master|doctor|associate|high school)"
+        r"|(b\.?sc|b\.?s|b\.?a|m\.?sc|m\.?s|m\.?a|mba|ph\.?d|m\.?d|j\.?d)\.?(?![a-z])"
+        r")"
+    )
+    _DEGREE_MAP = {
+        "bachelor": "Bachelor", "bsc": "Bachelor", "bs": "Bachelor", "ba": "Bachelor",
+        "master": "Master", "msc": "Master", "ms": "Master", "ma": "Master", "mba": "Master",
+        "doctor": "PhD", "phd": "PhD", "md": "PhD", "jd": "PhD",
+        "associate": "Associate",
+        "high school": "High School"
+    }
+
     def __init__(self):
         self.default_weights = {
             "technicalSkills": 0.4,
@@ -13,42 +91,66 @@ class JobScoringService:
             "culturalFit": 0.1
         }
 
-    def calculate_role_specific_score(self, candidate_data: Dict[str, Any], job_requirement: Dict[str, Any]) -> Dict[str, Any]:
+    def calculate_role_specific_scores(self, candidates: List[Dict[str, Any]], job_requirement: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """
+        Calculate role-specific scores for many candidates against one job.
+        Requirements are flattened and the timestamp taken once for the whole batch.
+        """
+        compiled_requirements = self.precompile_requirements(
+            job_requirement.get("spec", {}).get("requiredSkills", {})
+        )
+        timestamp = _utc_timestamp()
+        return [
+            self.calculate_role_specific_score(candidate_data, job_requirement, compiled_requirements, timestamp)
+            for candidate_data in candidates
+        ]
+
+    def calculate_role_specific_score(self, candidate_data: Dict[str, Any], job_requirement: Dict[str, Any], compiled_requirements: Optional[Dict[str, Any]] = None, timestamp: Optional[str] = None) -> Dict[str, Any]:
         """
         Calculate a role-specific score for a candidate based on job requirements.
+        Pass the result of precompile_requirements when scoring many candidates for one job.
         """
         try:
+            # Look up the nested inputs once
+            spec = job_requirement.get("spec", {})
+            analysis = candidate_data.get("analysis", {})
+            structured = candidate_data.get("structured_data", {})
+            
             # Get scoring weights from job requirement or use defaults
-            weights = job_requirement.get("spec", {}).get("scoringWeights", self.default_weights)
+            weights = spec.get("scoringWeights", self.default_weights)
+            technical_weight = weights["technicalSkills"]
+            experience_weight = weights["experience"]
+            education_weight = weights["education"]
+            cultural_weight = weights["culturalFit"]
             
             # Calculate individual component scores
             technical_score = self._calculate_technical_score(
-                candidate_data.get("analysis", {}).get("technical_skills", {}),
-                job_requirement.get("spec", {}).get("requiredSkills", {})
+                analysis.get("technical_skills", {}),
+                spec.get("requiredSkills", {}),
+                compiled_requirements
             )
             
             experience_score = self._calculate_experience_score(
-                candidate_data.get("analysis", {}).get("experience_level", "Unknown"),
-                job_requirement.get("spec", {}).get("requiredExperience", {})
+                analysis.get("experience_level", "Unknown"),
+                spec.get("requiredExperience", {})
             )
             
             education_score = self._calculate_education_score(
-                candidate_data.get("structured_data", {}).get("education", []),
-                job_requirement.get("spec", {}).get("requiredEducation", {})
+                structured.get("education", []),
+                spec.get("requiredEducation", {})
             )
             
             cultural_score = self._calculate_cultural_score(
-                candidate_data.get("analysis", {}).get("cultural_fit", 0),
-                job_requirement.get("spec", {}).get("culturalRequirements", {})
+                analysis.get("cultural_fit", 0),
+                spec.get("culturalRequirements", {})
             )
             
             # Calculate weighted overall score
-            overall_score = (
-                technical_score * weights["technicalSkills"] +
-                experience_score * weights["experience"] +
-                education_score * weights["education"] +
-                cultural_score * weights["culturalFit"]
-            )
+            technical_weighted = technical_score * technical_weight
+            experience_weighted = experience_score * experience_weight
+            education_weighted = education_score * education_weight
+            cultural_weighted = cultural_score * cultural_weight
+            overall_score = technical_weighted + experience_weighted + education_weighted + cultural_weighted
             
             # Prepare detailed scoring breakdown
             scoring_breakdown = {
@@ -56,30 +158,30 @@ class JobScoringService:
                 "components": {
                     "technical_skills": {
                         "score": round(technical_score, 2),
-                        "weight": weights["technicalSkills"],
-                        "weighted_score": round(technical_score * weights["technicalSkills"], 2)
+                        "weight": technical_weight,
+                        "weighted_score": round(technical_weighted, 2)
                     },
                     "experience": {
                         "score": round(experience_score, 2),
-                        "weight": weights["experience"],
-                        "weighted_score": round(experience_score * weights["experience"], 2)
+                        "weight": experience_weight,
+                        "weighted_score": round(experience_weighted, 2)
                     },
                     "education": {
                         "score": round(education_score, 2),
-                        "weight": weights["education"],
-                        "weighted_score": round(education_score * weights["education"], 2)
+                        "weight": education_weight,
+                        "weighted_score": round(education_weighted, 2)
                     },
                     "cultural_fit": {
                         "score": round(cultural_score, 2),
-                        "weight": weights["culturalFit"],
-                        "weighted_score": round(cultural_score * weights["culturalFit"], 2)
+                        "weight": cultural_weight,
+                        "weighted_score": round(cultural_weighted, 2)
                     }
                 },
                 "job_requirement": {
-                    "title": job_requirement.get("spec", {}).get("title", "Unknown"),
-                    "department": job_requirement.get("spec", {}).get("department", "Unknown")
+                    "title": spec.get("title", "Unknown"),
+                    "department": spec.get("department", "Unknown")
                 },
-                "timestamp": datetime.utcnow().isoformat()
+                "timestamp": timestamp or _utc_timestamp()
             }
             
             return scoring_breakdown
@@ -88,33 +190,119 @@ class JobScoringService:
             logger.error(f"Error calculating role-specific score: {str(e)}")
             raise
 
-    def _calculate_technical_score(self, candidate_skills: Dict[str, Any], required_skills: Dict[str, Any]) -> float:
+    def calculate_matrix(self, candidates: List[Dict[str, Any]], jobs: List[Dict[str, Any]]) -> np.ndarray:
+        """
+        Score every candidate against every job at once.
+        Returns an (N candidates, M jobs) array; entry [i, j] equals the overall score
+        calculate_role_specific_score gives candidates[i] for jobs[j] (before rounding).
+        """
+        n, m = len(candidates), len(jobs)
+        if n == 0 or m == 0:
+            return np.zeros((n, m))
+        
+        specs = [job.get("spec", {}) for job in jobs]
+        analyses = [candidate.get("analysis", {}) for candidate in candidates]
+        educations = [candidate.get("structured_data", {}).get("education", []) for candidate in candidates]
+        
+        # Technical skills: one column per (category, skill) required by any job
+        compiled = [self.precompile_requirements(spec.get("requiredSkills", {})) for spec in specs]
+        skill_index: Dict[Any, int] = {}
+        for job_compiled in compiled:
+            for key in job_compiled["skill_keys"]:
+                skill_index.setdefault(key, len(skill_index))
+        required_levels = np.zeros((m, len(skill_index)))
+        is_required = np.zeros((m, len(skill_index)), dtype=bool)
+        for j, job_compiled in enumerate(compiled):
+            columns = [skill_index[key] for key in job_compiled["skill_keys"]]
+            required_levels[j, columns] = job_compiled["min_levels"]
+            is_required[j, columns] = True
+        candidate_levels = np.array(
+            [[analysis.get("technical_skills", {}).get(category, {}).get(skill, 0) for category, skill in skill_index] for analysis in analyses],
+            dtype=np.float64
+        ).reshape(n, len(skill_index))
+        credit = _requirement_credit(candidate_levels[:, None, :], required_levels[None, :, :]) * is_required
+        required_counts = is_required.sum(axis=1)
+        technical = np.divide(credit.sum(axis=2) * 100, required_counts, out=np.zeros((n, m)), where=required_counts > 0)
+        
+        # Experience level
+        candidate_experience = np.array([self._EXPERIENCE_LEVELS.get(analysis.get("experience_level", "Unknown"), 0) for analysis in analyses], dtype=np.float64)
+        required_experience = [spec.get("requiredExperience", {}) for spec in specs]
+        required_experience_levels = np.array([self._EXPERIENCE_LEVELS.get(req.get("level", "Mid-level"), 0) for req in required_experience], dtype=np.float64)
+        has_experience_requirement = np.array([bool(req) for req in required_experience])
+        experience = _requirement_credit(candidate_experience[:, None], required_experience_levels[None, :]) * 100 * has_experience_requirement
+        
+        # Education level plus the preferred-field bonus
+        required_education = [spec.get("requiredEducation", {}) for spec in specs]
+        candidate_degrees = np.array([self._highest_degree_value(edu) for edu in educations], dtype=np.float64)
+        required_degrees = np.array([self._DEGREE_VALUES.get(req.get("minimumDegree", "Bachelor"), 0) for req in required_education], dtype=np.float64)
+        education = _requirement_credit(candidate_degrees[:, None], required_degrees[None, :]) * 100
+        for j, req in enumerate(required_education):
+            preferred_fields = req.get("preferredFields", [])
+            if preferred_fields:
+                education[:, j] += [20 if self._has_preferred_field(edu, preferred_fields) else 0 for edu in educations]
+        has_education = np.array([bool(edu) for edu in educations])
+        has_education_requirement = np.array([bool(req) for req in required_education])
+        education = np.minimum(education, 100) * (has_education[:, None] & has_education_requirement[None, :])
+        
+        # Cultural fit against each job's attribute levels
+        cultural_fits = np.array([analysis.get("cultural_fit", 0) for analysis in analyses], dtype=np.float64)
+        cultural = np.empty((n, m))
+        for j, spec in enumerate(specs):
+            requirements = spec.get("culturalRequirements", {})
+            if requirements:
+                levels = np.fromiter(requirements.values(), dtype=np.float64, count=len(requirements))
+                cultural[:, j] = _requirement_credit(cultural_fits[:, None], levels[None, :]).mean(axis=1) * 100
+            else:
+                cultural[:, j] = cultural_fits
+        
+        # Weighted overall score, one weight vector per job
+        weights = np.array([
+            [w["technicalSkills"], w["experience"], w["education"], w["culturalFit"]]
+            for w in (spec.get("scoringWeights", self.default_weights) for spec in specs)
+        ], dtype=np.float64)
+        return (
+            technical * weights[:, 0] +
+            experience * weights[:, 1] +
+            education * weights[:, 2] +
+            cultural * weights[:, 3]
+        )
+
+    def precompile_requirements(self, required_skills: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Flatten a job's required skills into (category, skill) keys and an array of minimum levels.
+        """
+        skill_keys = []
+        min_levels = []
+        for category in self._SKILL_CATEGORIES:
+            for skill, min_level in required_skills.get(category, {}).items():
+                skill_keys.append((category, skill))
+                min_levels.append(min_level)
+        return {
+            "skill_keys": skill_keys,
+            "min_levels": np.array(min_levels, dtype=np.float64)
+        }
+
+    def _calculate_technical_score(self, candidate_skills: Dict[str, Any], required_skills: Dict[str, Any], compiled: Optional[Dict[str, Any]] = None) -> float:
         """
         Calculate technical skills score based on required skills.
         """
         if not required_skills:
             return 0.0
-            
-        total_score = 0.0
-        total_required = 0
         
-        # Process each skill category
-        for category in ["programmingLanguages", "frameworks", "cloudAndDevOps", "tools"]:
-            required = required_skills.get(category, {})
-            candidate = candidate_skills.get(category, {})
-            
-            for skill, min_level in required.items():
-                total_required += 1
-                candidate_level = candidate.get(skill, 0)
-                
-                # Calculate score based on how well the candidate meets the requirement
-                if candidate_level >= min_level:
-                    total_score += 1.0
-                else:
-                    # Partial credit for being close to the requirement
-                    total_score += max(0, candidate_level / min_level)
+        if compiled is None:
+            compiled = self.precompile_requirements(required_skills)
+        skill_keys = compiled["skill_keys"]
+        min_levels = compiled["min_levels"]
+        if not skill_keys:
+            return 0.0
         
-        return (total_score / total_required) * 100 if total_required > 0 else 0.0
+        candidate_levels = np.fromiter(
+            (candidate_skills.get(category, {}).get(skill, 0) for category, skill in skill_keys),
+            dtype=np.float64,
+            count=len(skill_keys)
+        )
+        
+        return _score_kernel(candidate_levels, min_levels)
 
     def _calculate_experience_score(self, candidate_level: str, required_experience: Dict[str, Any]) -> float:
         """
@@ -126,16 +314,8 @@ class JobScoringService:
         required_level = required_experience.get("level", "Mid-level")
         required_years = required_experience.get("years", 0)
         
-        # Map experience levels to numeric values
-        level_values = {
-            "Junior": 1,
-            "Mid-level": 2,
-            "Senior": 3,
-            "Lead": 4
-        }
-        
-        candidate_value = level_values.get(candidate_level, 0)
-        required_value = level_values.get(required_level, 0)
+        candidate_value = self._EXPERIENCE_LEVELS.get(candidate_level, 0)
+        required_value = self._EXPERIENCE_LEVELS.get(required_level, 0)
         
         # Calculate score based on level match
         if candidate_value >= required_value:
@@ -149,16 +329,9 @@ class JobScoringService:
         Normalize degree names to standard categories.
         """
         degree = degree.lower()
-        if any(x in degree for x in ["bachelor", "b.s.", "bs", "ba"]):
-            return "Bachelor"
-        if any(x in degree for x in ["master", "m.s.", "ms", "ma", "mba"]):
-            return "Master"
-        if any(x in degree for x in ["phd", "doctor", "ph.d.", "md", "jd"]):
-            return "PhD"
-        if "associate" in degree:
-            return "Associate"
-        if "high school" in degree:
-            return "High School"
+        match = self._DEGREE_RE.search(degree)
+        if match:
+            return self._DEGREE_MAP[match.group(1) or match.group(2).replace(".", "")]
         return degree.title()
 
     def _calculate_education_score(self, candidate_education: List[Dict[str, Any]], required_education: Dict[str, Any]) -> float:
@@ -169,54 +342,50 @@ class JobScoringService:
             return 0.0
         required_degree = required_education.get("minimumDegree", "Bachelor")
         preferred_fields = required_education.get("preferredFields", [])
-        # Map degrees to numeric values
-        degree_values = {
-            "High School": 1,
-            "Associate": 2,
-            "Bachelor": 3,
-            "Master": 4,
-            "PhD": 5
-        }
-        # Find highest degree (normalized)
-        highest_degree = "High School"
-        for edu in candidate_education:
-            degree = self._normalize_degree(edu.get("degree", ""))
-            if degree in degree_values and degree_values[degree] > degree_values.get(highest_degree, 0):
-                highest_degree = degree
-        # Calculate base score from degree level
-        candidate_value = degree_values.get(highest_degree, 0)
-        required_value = degree_values.get(required_degree, 0)
+        # Calculate base score from the highest degree level
+        candidate_value = self._highest_degree_value(candidate_education)
+        required_value = self._DEGREE_VALUES.get(required_degree, 0)
         if candidate_value >= required_value:
             base_score = 100.0
         else:
             base_score = (candidate_value / required_value) * 100 if required_value else 0
-        # Check for preferred fields (case-insensitive, partial match)
-        field_bonus = 0
-        if preferred_fields:
-            for edu in candidate_education:
-                field = edu.get("degree", "").lower()
-                if any(pref.lower() in field for pref in preferred_fields):
-                    field_bonus = 20
-                    break
+        field_bonus = 20 if self._has_preferred_field(candidate_education, preferred_fields) else 0
         return min(100, base_score + field_bonus)
 
+    def _highest_degree_value(self, candidate_education: List[Dict[str, Any]]) -> int:
+        """
+        Numeric value of the candidate's highest normalized degree, at least High School.
+        """
+        highest = self._DEGREE_VALUES["High School"]
+        for edu in candidate_education:
+            value = self._DEGREE_VALUES.get(self._normalize_degree(edu.get("degree", "")), 0)
+            if value > highest:
+                highest = value
+        return highest
+
+    def _has_preferred_field(self, candidate_education: List[Dict[str, Any]], preferred_fields: List[str]) -> bool:
+        """
+        Check for preferred fields in the candidate's degrees (case-insensitive, partial match).
+        """
+        if not preferred_fields:
+            return False
+        preferred = [pref.lower() for pref in preferred_fields]
+        for edu in candidate_education:
+            field = edu.get("degree", "").lower()
+            if any(pref in field for pref in preferred):
+                return True
+        return False
+
     def _calculate_cultural_score(self, candidate_cultural_fit: float, cultural_requirements: Dict[str, Any]) -> float:
         """
         Calculate cultural fit score based on required cultural attributes.
         """
         if not cultural_requirements:
             return candidate_cultural_fit
-            
-        total_score = 0.0
-        total_required = 0
         
-        for attribute, required_level in cultural_requirements.items():
-            total_required += 1
-            # For now, we'll use the overall cultural fit score
-            # In a real implementation, we would have specific scores for each attribute
-            if candidate_cultural_fit >= required_level:
-                total_score += 1.0
-            else:
-                total_score += max(0, candidate_cultural_fit / required_level)
+        required_levels = np.fromiter(cultural_requirements.values(), dtype=np.float64, count=len(cultural_requirements))
+        # For now, we'll use the overall cultural fit score for every attribute
+        # In a real implementation, we would have specific scores for each attribute
+        candidate_levels = np.full(required_levels.size, candidate_cultural_fit, dtype=np.float64)
         
-        return (total_score / total_required) * 100 if total_required > 0 else candidate_cultural_fit 
\ No newline at end of file
+        return _score_kernel(candidate_levels, required_levels) 
\ No newline at end of file
@@ -1,9 +1,89 @@
-import os
-import tempfile
 import re
-from typing import Dict, Any
-from pdfminer.high_level import extract_text
-from pdfminer.pdfparser import PDFSyntaxError
+import asyncio
+from bisect import bisect_right
+from concurrent.futures import ThreadPoolExecutor
+from itertools import accumulate
+from typing import Dict, Any, List, Optional
+import pymupdf
+
+# Patterns used by extract_structured_data, compiled once at import
+_EMAIL_RE = re.compile(r'[\w\.-]+@[\w\.-]+\.\w+')
+# Separators may be any whitespace except a newline, so a match never spans two lines
+_PHONE_RE = re.compile(r'\(?\d{3}\)?(?:[-.]|[^\S\n])?\d{3}(?:[-.]|[^\S\n])?\d{4}')
+_CONTACT_RE = re.compile(r'(?:Mobile|Phone|Tel|Telephone)[:\s]*[\+\d\-\(\)\s]+')
+_YEAR_RE = re.compile(r'\d{4}')
+_EDU_YEAR_RE = re.compile(r'(19|20)\d{2}')
+_DEGREE_RE = re.compile(r'(Bachelor|B\.S\.|BS|Master|M\.S\.|MS|PhD|Doctor|Associate|Bachelors|Masters|BA|MA|MBA|JD|MD)', re.I)
+_SCHOOL_RE = re.compile(r'(University|College|Institute|School|Academy|Polytechnic|State University|Tech)', re.I)
+# Section keywords are matched as substrings of lowercased lines
+_EDU_KWS = ("education", "university", "college", "degree", "bachelor", "master", "phd")
+_EDU_END_KWS = ("experience", "work", "employment", "skills", "projects")
+_EXP_KWS = ("experience", "work", "employment")
+_EXP_END_KWS = ("education", "skills", "projects")
+_SECTION_KWS = ("experience", "education", "skills", "projects")
+_SKILL_KWS = ("skills", "technologies", "tools", "languages", "programming")
+_SKILL_END_KWS = ("experience", "education", "projects")
+_SKILLS_SPLIT_RE = re.compile(r'[,•]')
+# Words, plus c++ and c# which contain non-word characters and keep the original \b rules
+_SKILL_TOKEN_RE = re.compile(r'\bc(?:\+\+|#)\b|\w+')
+
+_LANG_KEYWORDS = frozenset({
+    "java", "python", "javascript", "typescript", "ruby", "php", "c++", "c#", "swift", "kotlin",
+    "go", "rust", "scala", "perl", "r", "matlab", "sql", "html", "css",
+})
+_TECH_KEYWORDS = frozenset({
+    "aws", "azure", "gcp", "docker", "kubernetes", "react", "angular", "vue", "node", "express",
+    "django", "flask", "spring", "git", "jenkins", "agile", "scrum", "linux", "unix", "windows", "macos",
+})
+
+def _looks_like_name(line: str) -> bool:
+    """
+    Match "FirstName LastName": two or more capitalized ASCII words.
+    """
+    parts = line.split()
+    return len(parts) >= 2 and all(
+        len(part) > 1 and part.isascii() and part.isalpha() and part[0].isupper() and part[1:].islower()
+        for part in parts
+    )
+
+def _contains_any(text: str, keywords) -> bool:
+    return any(keyword in text for keyword in keywords)
+
+def _classify_skills(skills: List[str]) -> List[Optional[str]]:
+    """
+    Return "lang", "tech" or None for each skill, scanning all of them in one pass.
+    A programming language anywhere in a skill takes precedence over a technical skill keyword.
+    """
+    joined = "\n".join(skills)
+    haystack = joined.lower()
+    pieces = skills
+    if len(haystack) != len(joined):
+        # Some characters change length when lowercased, so offsets must come from the lowered skills
+        pieces = [skill.lower() for skill in skills]
+        haystack = "\n".join(pieces)
+    # Offset of each skill in the haystack, to map token matches back to their skill
+    starts = list(accumulate((len(piece) + 1 for piece in pieces[:-1]), initial=0))
+
+    categories = [None] * len(skills)
+    for match in _SKILL_TOKEN_RE.finditer(haystack):
+        token = match.group(0)
+        if token in _LANG_KEYWORDS:
+            categories[bisect_right(starts, match.start()) - 1] = "lang"
+        elif token in _TECH_KEYWORDS:
+            index = bisect_right(starts, match.start()) - 1
+            if categories[index] is None:
+                categories[index] = "tech"
+    return categories
+
+# PyMuPDF is not thread-safe, so all extraction runs on one dedicated worker thread
+_PDF_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pdf-extract")
+
+def _extract_pdf_text(file_content: bytes) -> str:
+    """
+    Extract the text of every page of a PDF held in memory.
+    """
+    with pymupdf.open(stream=file_content, filetype="pdf") as doc:
+        return "\n".join(page.get_text("text") for page in doc)
 
 class ResumeParser:
     def __init__(self):
@@ -15,21 +95,13 @@ class ResumeParser:
         Parse a resume and return its content as text.
         """
         try:
-            # Create a temporary file to store the PDF content
-            with tempfile.NamedTemporaryFile(suffix='.pdf', delete=False) as temp_file:
-                temp_file.write(file_content)
-                temp_file_path = temp_file.name
-
-            try:
-                # Extract text from PDF
-                text = extract_text(temp_file_path)
-                if not text.strip():
-                    raise ValueError("PDF parsing resulted in empty text")
-                return text
-            finally:
-                # Clean up the temporary file
-                os.unlink(temp_file_path)
-        except (PDFSyntaxError, ValueError) as e:
+            # Extract text on the PDF worker thread to keep the event loop free
+            loop = asyncio.get_running_loop()
+            text = await loop.run_in_executor(_PDF_EXECUTOR, _extract_pdf_text, file_content)
+            if not text.strip():
+                raise ValueError("PDF parsing resulted in empty text")
+            return text
+        except (pymupdf.FileDataError, ValueError) as e:
             # If PDF parsing fails, return a placeholder for now
             # TODO: Implement better error handling or fallback parsing
             return f"Error parsing PDF: {str(e)}"
@@ -45,11 +117,22 @@ class ResumeParser:
             "phone": "",
             "skills": [],
             "experience": [],
-            "education": []
+            "education": [],
+            "programming_languages": [],
+            "technical_skills": []
         }
 
+        # Extract email and phone from the full text
+        email_match = _EMAIL_RE.search(resume_content)
+        if email_match:
+            structured_data["email"] = email_match.group(0)
+        phone_match = _PHONE_RE.search(resume_content)
+        if phone_match:
+            structured_data["phone"] = phone_match.group(0)
+
         # Split content into lines and clean them
         lines = [line.strip() for line in resume_content.split('\n') if line.strip()]
+        lines_lower = [line.lower() for line in lines]
 
         # Extract name using multiple approaches
         name_found = False
@@ -59,7 +142,7 @@ class ResumeParser:
         
         # First try to find name with explicit header
         for i, line in enumerate(lines[:10]):  # Check first 10 lines
-            line_lower = line.lower()
+            line_lower = lines_lower[i]
             for header in name_headers:
                 if line_lower.startswith(header):
                     # Extract name after the header
@@ -74,9 +157,8 @@ class ResumeParser:
         # If no name found with header, try to identify name by pattern
         if not name_found:
             # Look for a name-like pattern in the first few lines
-            name_pattern = r'^[A-Z][a-z]+(?:\s+[A-Z][a-z]+)+$'  # Matches "FirstName LastName" pattern
             for line in lines[:5]:  # Check first 5 lines
-                if re.match(name_pattern, line):
+                if _looks_like_name(line):
                     structured_data["name"] = line
                     name_found = True
                     break
@@ -85,137 +167,116 @@ class ResumeParser:
         if not name_found and lines:
             # Remove common resume headers if present
             first_line = lines[0]
-            if first_line.lower() not in ['resume', 'curriculum vitae', 'cv']:
+            if lines_lower[0] not in ['resume', 'curriculum vitae', 'cv']:
                 structured_data["name"] = first_line
 
-        # Extract email and phone
-        email_pattern = r'[\w\.-]+@[\w\.-]+\.\w+'
-        phone_pattern = r'\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4}'
-        
-        for line in lines:
-            # Find email
-            email_match = re.search(email_pattern, line)
-            if email_match:
-                structured_data["email"] = email_match.group(0)
-            
-            # Find phone
-            phone_match = re.search(phone_pattern, line)
-            if phone_match:
-                structured_data["phone"] = phone_match.group(0)
-
-        # Extract education
+        # Extract education, experience and skills in a single pass.
+        # Each section keeps its own flag because a header line can open one section
+        # while closing another. Output lists are bound to locals and appended to in place.
         education_section = False
-        education_entries = []
+        education_entries = structured_data["education"]
         current_edu = {}
+
+        experience_section = False
+        experience_entries = structured_data["experience"]
+        current_experience = {}
+
+        skills_section = False
+        section_skills = []
+        other_skills = structured_data["skills"]
+        programming_languages = structured_data["programming_languages"]
+        technical_skills = structured_data["technical_skills"]
+
         for i, line in enumerate(lines):
-            # Start of education section
-            if re.search(r'education|university|college|degree|bachelor|master|phd', line.lower()):
+            line_lower = lines_lower[i]
+
+            # Education
+            if _contains_any(line_lower, _EDU_KWS):
+                # Start of education section
                 education_section = True
-                continue
-            if education_section:
+            elif education_section:
                 # End of education section
-                if re.search(r'experience|work|employment|skills|projects', line.lower()):
+                if _contains_any(line_lower, _EDU_END_KWS):
                     education_section = False
                     if current_edu:
                         education_entries.append(current_edu)
                         current_edu = {}
-                    continue
-                # Try to extract degree
-                degree_match = re.search(r'(Bachelor|B\.S\.|BS|Master|M\.S\.|MS|PhD|Doctor|Associate|Bachelors|Masters|BA|MA|MBA|JD|MD)', line, re.IGNORECASE)
-                if degree_match:
-                    current_edu['degree'] = degree_match.group(0)
-                # Try to extract school/university
-                school_match = re.search(r'(University|College|Institute|School|Academy|Polytechnic|State University|Tech)', line, re.IGNORECASE)
-                if school_match:
-                    current_edu['school'] = line.strip()
-                # Try to extract year
-                year_match = re.search(r'(19|20)\d{2}', line)
-                if year_match:
-                    current_edu['year'] = year_match.group(0)
-                # If we have at least degree and year, consider this a complete entry
-                if 'degree' in current_edu and 'year' in current_edu:
-                    education_entries.append(current_edu)
-                    current_edu = {}
-        # Add any remaining entry
-        if current_edu:
-            education_entries.append(current_edu)
-        structured_data['education'] = education_entries
+                else:
+                    # Try to extract degree
+                    degree_match = _DEGREE_RE.search(line)
+                    if degree_match:
+                        current_edu['degree'] = degree_match.group(0)
+                    # Try to extract school/university
+                    school_match = _SCHOOL_RE.search(line)
+                    if school_match:
+                        current_edu['school'] = line.strip()
+                    # Try to extract year
+                    year_match = _EDU_YEAR_RE.search(line)
+                    if year_match:
+                        current_edu['year'] = year_match.group(0)
+                    # If we have at least degree and year, consider this a complete entry
+                    if 'degree' in current_edu and 'year' in current_edu:
+                        education_entries.append(current_edu)
+                        current_edu = {}
 
-        # Extract experience
-        experience_section = False
-        current_experience = {}
-        current_company = ""
-        
-        for line in lines:
-            # Skip lines that look like contact information
-            if re.search(r'(?:Mobile|Phone|Tel|Telephone)[:\s]*[\+\d\-\(\)\s]+', line):
-                continue
-                
-            if re.search(r'experience|work|employment', line.lower()):
+            # Experience, skipping lines that look like contact information
+            if _CONTACT_RE.search(line):
+                pass
+            elif _contains_any(line_lower, _EXP_KWS):
                 experience_section = True
-                continue
-            
-            if experience_section:
-                if re.search(r'education|skills|projects', line.lower()):
+            elif experience_section:
+                if _contains_any(line_lower, _EXP_END_KWS):
                     experience_section = False
                     if current_experience:
-                        structured_data["experience"].append(current_experience)
+                        experience_entries.append(current_experience)
                         current_experience = {}
-                    continue
-                
-                # Try to extract experience details
-                if re.search(r'\d{4}', line):  # Year pattern
-                    if current_experience:
-                        structured_data["experience"].append(current_experience)
-                    
-                    # Look for company name in the next line
-                    company_line = ""
-                    for next_line in lines[lines.index(line) + 1:]:
-                        if not re.search(r'\d{4}', next_line) and not re.search(r'experience|education|skills|projects', next_line.lower()):
-                            company_line = next_line
-                            break
-                    
-                    current_experience = {
-                        "title": line,
-                        "company": company_line.strip(),
-                        "duration": re.search(r'\d{4}', line).group(0)
-                    }
+                else:
+                    # Try to extract experience details
+                    year_match = _YEAR_RE.search(line)
+                    if year_match:
+                        if current_experience:
+                            experience_entries.append(current_experience)
 
-        # Add the last experience if exists
-        if current_experience:
-            structured_data["experience"].append(current_experience)
+                        # Look for company name in the next line
+                        company_line = ""
+                        for j in range(i + 1, len(lines)):
+                            if not _YEAR_RE.search(lines[j]) and not _contains_any(lines_lower[j], _SECTION_KWS):
+                                company_line = lines[j]
+                                break
 
-        # Extract skills
-        skills_section = False
-        programming_languages = []
-        technical_skills = []
-        
-        for line in lines:
-            if re.search(r'skills|technologies|tools|languages|programming', line.lower()):
+                        current_experience = {
+                            "title": line,
+                            "company": company_line.strip(),
+                            "duration": year_match.group(0)
+                        }
+
+            # Skills
+            if _contains_any(line_lower, _SKILL_KWS):
                 skills_section = True
-                continue
-            
-            if skills_section:
-                if re.search(r'experience|education|projects', line.lower()):
+            elif skills_section:
+                if _contains_any(line_lower, _SKILL_END_KWS):
                     skills_section = False
-                    continue
-                
-                # Add skills (comma-separated or bullet points)
-                skills = [skill.strip() for skill in re.split(r'[,•]', line) if skill.strip()]
-                
-                # Categorize skills
-                for skill in skills:
-                    # Common programming languages
-                    if re.search(r'\b(java|python|javascript|typescript|ruby|php|c\+\+|c#|swift|kotlin|go|rust|scala|perl|r|matlab|sql|html|css)\b', skill.lower()):
-                        programming_languages.append(skill)
-                    # Other technical skills
-                    elif re.search(r'\b(aws|azure|gcp|docker|kubernetes|react|angular|vue|node|express|django|flask|spring|git|jenkins|agile|scrum|linux|unix|windows|macos)\b', skill.lower()):
-                        technical_skills.append(skill)
-                    else:
-                        structured_data["skills"].append(skill)
-        
-        # Add categorized skills
-        structured_data["programming_languages"] = programming_languages
-        structured_data["technical_skills"] = technical_skills
+                else:
+                    # Collect skills (comma-separated or bullet points), categorized after the pass
+                    section_skills.extend(skill.strip() for skill in _SKILLS_SPLIT_RE.split(line) if skill.strip())
+
+        # Categorize skills
+        for skill, category in zip(section_skills, _classify_skills(section_skills)):
+            # Common programming languages
+            if category == "lang":
+                programming_languages.append(skill)
+            # Other technical skills
+            elif category == "tech":
+                technical_skills.append(skill)
+            else:
+                other_skills.append(skill)
+
+        # Add any remaining education entry
+        if current_edu:
+            education_entries.append(current_edu)
+
+        # Add the last experience if exists
+        if current_experience:
+            experience_entries.append(current_experience)
 
-        return structured_data 
\ No newline at end of file
+        return structured_data
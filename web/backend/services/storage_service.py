@@ -1,38 +1,85 @@
 import os
+import io
+import time
+import asyncio
+from functools import lru_cache
 import boto3
-from typing import Dict, Any
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from typing import Dict, Any, Optional
 
-class StorageService:
-    def __init__(self):
-        self.s3_client = boto3.client(
+# Shared across StorageService instances so connections stay pooled and warm
+_s3_client: Optional[Any] = None
+
+# Files above 8MB are uploaded as multipart, with up to 4 parts in flight
+_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    max_concurrency=4,
+    use_threads=True
+)
+
+def _get_s3_client():
+    """
+    Return the shared S3 client for DigitalOcean Spaces.
+    """
+    global _s3_client
+    if _s3_client is None:
+        _s3_client = boto3.client(
             's3',
             endpoint_url=os.getenv('DO_SPACES_ENDPOINT'),
             aws_access_key_id=os.getenv('DO_SPACES_KEY'),
             aws_secret_access_key=os.getenv('DO_SPACES_SECRET'),
-            region_name=os.getenv('DO_SPACES_REGION')
+            region_name=os.getenv('DO_SPACES_REGION'),
+            config=Config(
+                max_pool_connections=50,
+                retries={'max_attempts': 3, 'mode': 'adaptive'},
+                tcp_keepalive=True
+            )
         )
+    return _s3_client
+
+# Presigned URLs are reused within a 5 minute window, so a URL handed out
+# is always valid for at least 55 of its 60 minutes
+_PRESIGN_WINDOW = 300
+
+@lru_cache(maxsize=1024)
+def _presigned_url(bucket: str, key: str, window: int) -> str:
+    """
+    Return a 1 hour presigned GET URL, signed once per (bucket, key, window).
+    """
+    return _get_s3_client().generate_presigned_url(
+        'get_object',
+        Params={
+            'Bucket': bucket,
+            'Key': key
+        },
+        ExpiresIn=3600  # URL expires in 1 hour
+    )
+
+class StorageService:
+    def __init__(self):
+        self.s3_client = _get_s3_client()
         self.bucket_name = os.getenv('DO_SPACES_BUCKET')
+        # Public URL prefix for objects in the bucket
+        self._url_prefix = f"https://{self.bucket_name}.{os.getenv('DO_SPACES_REGION')}.digitaloceanspaces.com/"
 
     async def upload_resume(self, file_content: bytes, filename: str) -> Dict[str, str]:
         """
         Upload a resume to DigitalOcean Spaces.
         """
         key = f"resumes/{filename}"
-        self.s3_client.put_object(
+        # Upload in a worker thread so the event loop isn't blocked for the transfer
+        await asyncio.to_thread(
+            self.s3_client.upload_fileobj,
+            io.BytesIO(file_content),
             Bucket=self.bucket_name,
             Key=key,
-            Body=file_content
+            Config=_TRANSFER_CONFIG,
+            ExtraArgs={'ContentType': 'application/pdf'}
         )
 
         # Generate a temporary URL for the file
-        url = self.s3_client.generate_presigned_url(
-            'get_object',
-            Params={
-                'Bucket': self.bucket_name,
-                'Key': key
-            },
-            ExpiresIn=3600  # URL expires in 1 hour
-        )
+        url = _presigned_url(self.bucket_name, key, int(time.time()) // _PRESIGN_WINDOW)
 
         return {
             "bucket": self.bucket_name,
@@ -54,7 +101,7 @@ class StorageService:
         )
 
         # Generate a direct URL for the file
-        url = f"https://{self.bucket_name}.{os.getenv('DO_SPACES_REGION')}.digitaloceanspaces.com/{key}"
+        url = self._url_prefix + key
 
         return {
             "bucket": self.bucket_name,
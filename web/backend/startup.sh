@@ -1,4 +1,6 @@
 #!/bin/bash
 
-# Start the FastAPI application with uvicorn
-exec uvicorn main:app --host 0.0.0.0 --port ${PORT:-8000} --workers 4 
\ No newline at end of file
+# Start the FastAPI application with uvicorn.
+# WEB_CONCURRENCY is exported so each worker can size its thread pools to its share of the cores.
+export WEB_CONCURRENCY=${WEB_CONCURRENCY:-4}
+exec uvicorn main:app --host 0.0.0.0 --port ${PORT:-8000} --workers $WEB_CONCURRENCY 
\ No newline at end of file
@@ -1,27 +1,30 @@
 import requests
-import json
+from requests.adapters import HTTPAdapter
+
+# Reuse connections to the local API across calls
+session = requests.Session()
+session.mount('http://', HTTPAdapter(pool_connections=10, pool_maxsize=10))
+
+# Test inputs are read once and reused by every call
+with open('../test_resume/Dale Yarborough.pdf', 'rb') as f:
+    _RESUME_BYTES = f.read()
+
+with open('test_job_requirement.json', 'r') as f:
+    _JOB_JSON = f.read()
 
 def test_resume_analysis():
-    # Load job requirement from JSON file
-    with open('test_job_requirement.json', 'r') as f:
-        job_requirement = json.dumps(json.load(f))
-    
-    # Read resume file as bytes
-    with open('../test_resume/Dale Yarborough.pdf', 'rb') as f:
-        resume_content = f.read()
-    
     # Prepare files for upload
     files = {
-        'file': ('resume.pdf', resume_content, 'application/pdf')
+        'file': ('resume.pdf', _RESUME_BYTES, 'application/pdf')
     }
     
     # Add job requirement as form data
     data = {
-        'job_requirement': job_requirement
+        'job_requirement': _JOB_JSON
     }
     
     # Make the request
-    response = requests.post(
+    response = session.post(
         'http://localhost:8000/api/analyze',
         files=files,
         data=data